@@ -0,0 +1,242 @@
+# Headless benchmarks of the simulation kernels at a range of problem sizes: throughput
+# and peak (tracemalloc) memory per kernel call, saved as a JSON baseline and compared
+# against an earlier one to flag regressions.
+
+import os
+import re
+import sys
+import json
+import time
+import platform
+import argparse
+import tracemalloc
+import numpy as np
+
+# name -> (unit, sizes, setup); setup(size, rng) returns (run, work): run() does one
+# call of the kernel, work is the number of units it processes
+KERNELS = {}
+
+def kernel(name, unit, sizes):
+    def register(setup):
+        KERNELS[name] = (unit, sizes, setup)
+        return setup
+    return register
+
+@kernel('percolation_sim', 'sites/s', [64, 256, 1024])
+def _percolation(N, rng):
+    from ch8_perc import percolation_sim
+    return lambda: percolation_sim(N, 0.5927, rng), N * N
+
+@kernel('ising.next', 'updates/s', [64, 256])
+def _ising_next(N, rng):
+    from ch20_ising_model import IsingModel
+    model = IsingModel(N, N, tau=2.0, seed=rng)
+    def run():
+        for _ in range(1000):
+            model.next()
+    return run, 1000
+
+@kernel('ising.sweep', 'updates/s', [64, 256, 1024])
+def _ising_sweep(N, rng):
+    from ch20_ising_model import IsingModel
+    model = IsingModel(N, N, tau=2.0, seed=rng)
+    return model.sweep, N * N
+
+@kernel('ising.packed_sweep', 'updates/s', [64, 256, 1000, 1024])
+def _ising_packed(N, rng):
+    from ch20_ising_model import PackedIsingModel
+    model = PackedIsingModel(N, N, tau=2.0, seed=rng)
+    return model.sweep, N * N
+
+@kernel('hydrogen.move', 'moves/s', [1000])
+def _hydrogen_move(n, rng):
+    from ch7_hydrogen import HydrogenAtomMarkovChain
+    chain = HydrogenAtomMarkovChain(2, 1, 0, seed=rng)
+    state = [np.array([1.0, 1.0, 1.0]), 0.0]
+    def run():
+        v, prob = state
+        for _ in range(n):
+            v, prob = chain.move(v, prob)
+        state[:] = v, prob
+    return run, n
+
+@kernel('hydrogen.move_ensemble', 'moves/s', [1000, 100000])
+def _hydrogen_ensemble(K, rng):
+    from ch7_hydrogen import HydrogenAtomMarkovChain
+    chain = HydrogenAtomMarkovChain(2, 1, 0, seed=rng)
+    state = [rng.normal(0, 5, (K, 3)), np.zeros(K)]
+    def run():
+        state[:] = chain.move_ensemble(*state)
+    return run, K
+
+def _integral(method):
+    def setup(N, rng):
+        from scipy.stats import expon
+        from ch7_basic_mc_integrate import calculate_integral, square
+        return lambda: calculate_integral(expon(), N, square, method, rng=rng), N
+    return setup
+
+for _method in ('plain', 'stratified', 'antithetic', 'sobol'):
+    kernel(f'calculate_integral.{_method}', 'samples/s', [10**4, 10**6])(_integral(_method))
+
+def _direct(EX):
+    def setup(n, rng):
+        from ch7_directsample import sample
+        return lambda: sample(EX, n, rng), n
+    return setup
+
+for _ex in (1, 2, 3):
+    kernel(f'directsample.ex{_ex}', 'samples/s', [10**4, 10**6])(_direct(_ex))
+
+@kernel('sampler.inverse_cdf', 'samples/s', [10**4, 10**6])
+def _inverse_cdf(n, rng):
+    from ch7_directsample import triangular_pdf
+    from ch7_sampler import InverseCDFSampler
+    sampler = InverseCDFSampler(triangular_pdf, -2.0, 2.0, rng=rng)
+    return lambda: sampler.sample(n), n
+
+@kernel('sampler.alias', 'samples/s', [10**4, 10**6])
+def _alias(n, rng):
+    from ch7_directsample import triangular_pdf
+    from ch7_sampler import AliasSampler
+    sampler = AliasSampler.from_pdf(triangular_pdf, np.linspace(-2.0, 2.0, 4097), rng=rng)
+    return lambda: sampler.sample_binned(n), n
+
+@kernel('sampler.rejection', 'samples/s', [10**4, 10**6])
+def _rejection(n, rng):
+    from ch7_directsample import triangular_pdf
+    from ch7_sampler import rejection_sample
+    return lambda: rejection_sample(triangular_pdf, -2.0, 2.0, 0.5, n, rng), n
+
+@kernel('sampler.envelope', 'samples/s', [10**4, 10**6])
+def _envelope(n, rng):
+    from ch7_throwaway2 import f
+    from ch7_sampler import EnvelopeRejectionSampler
+    sampler = EnvelopeRejectionSampler(f, [-1.0, 0.0], [1.0, 2 * np.pi], rng=rng)
+    return lambda: sampler.sample(n), n
+
+@kernel('kalman.update', 'updates/s', [1, 1000, 100000])
+def _kalman(K, rng):
+    from ch16_kalman_sigmoid import SigmoidEKF, noisy_data
+    x = rng.uniform(-5.0, 5.0, (64, K))
+    y = noisy_data(x, rng=rng)
+    ekf = SigmoidEKF(() if K == 1 else (K,), W=0.5, THETA=0.5)
+    if K == 1:
+        x, y = x[:, 0].tolist(), y[:, 0].tolist()
+    def run():
+        for i in range(64):
+            ekf.update(x[i], y[i])
+    return run, 64 * K
+
+@kernel('kalman.online', 'updates/s', [10000])
+def _kalman_online(n, rng):
+    from ch16_kalman_sigmoid import OnlineSigmoidFitter, SigmoidEKF, simulated_measurements
+    fitter = OnlineSigmoidFitter(SigmoidEKF(W=0.5, THETA=0.5))
+    measurements = simulated_measurements(rng=rng)
+    return lambda: fitter.consume(measurements, n), n
+
+def measure(run, work, min_time=0.2, repeats=5):
+    """Throughput of the best of repeats timing batches (each at least min_time/repeats
+       long, after a warm-up call) and the peak traced memory of one further call
+    """
+    t0 = time.perf_counter()
+    run()
+    calls = max(1, int(min_time / repeats / max(time.perf_counter() - t0, 1e-9)))
+    best = float('inf')
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        for _ in range(calls):
+            run()
+        best = min(best, (time.perf_counter() - t0) / calls)
+    tracemalloc.start()
+    try:
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return work / best, peak
+
+def run_benchmarks(patterns=None, min_time=0.2, repeats=5, seed=0, sizes=None):
+    """Results of every kernel whose name matches one of the patterns (regular
+       expressions, all kernels if None), printed as they complete
+    """
+    results = []
+    print(f"{'kernel':>28} {'size':>8} {'throughput':>12} {'unit':>10} {'peak MB':>9}")
+    for name, (unit, default_sizes, setup) in KERNELS.items():
+        if patterns and not any(re.search(p, name) for p in patterns):
+            continue
+        for size in (default_sizes if sizes is None else sizes):
+            run, work = setup(size, np.random.default_rng(seed))
+            throughput, peak = measure(run, work, min_time, repeats)
+            print(f"{name:>28} {size:>8} {throughput:12.4g} {unit:>10} {peak / 2**20:9.2f}")
+            results.append({'kernel': name, 'size': size, 'unit': unit,
+                            'throughput': throughput, 'peak_bytes': peak})
+    return results
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpus': os.cpu_count(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+def save_baseline(path, results):
+    with open(path, 'w') as f:
+        json.dump({'environment': environment(), 'results': results}, f, indent=1)
+
+def compare(results, baseline, tolerance=0.25, slack=2**16):
+    """Regressions against baseline results: throughput down by more than tolerance,
+       or peak memory up by more than tolerance (plus slack bytes of allocator noise)
+    """
+    old = {(r['kernel'], r['size']): r for r in baseline['results']}
+    regressions = []
+    print(f"{'kernel':>28} {'size':>8} {'speed':>8} {'memory':>8}")
+    for r in results:
+        b = old.get((r['kernel'], r['size']))
+        if b is None:
+            continue
+        speed = r['throughput'] / b['throughput']
+        memory = (r['peak_bytes'] + 1) / (b['peak_bytes'] + 1)
+        flags = []
+        if speed < 1 - tolerance:
+            flags.append('SLOWER')
+        if r['peak_bytes'] > b['peak_bytes'] * (1 + tolerance) + slack:
+            flags.append('MEMORY')
+        print(f"{r['kernel']:>28} {r['size']:>8} {speed:8.2f} {memory:8.2f} {' '.join(flags)}")
+        if flags:
+            regressions.append((r, b, flags))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless benchmarks of the simulation kernels.")
+    parser.add_argument('kernels', nargs='*', help='Regular expressions selecting kernels (default: all)')
+    parser.add_argument('--list', action='store_true', help='List the kernels and their sizes')
+    parser.add_argument('--sizes', type=int, nargs='+', default=None, help='Override the problem sizes')
+    parser.add_argument('--min-time', type=float, default=0.2, help='Seconds of timing per kernel and size')
+    parser.add_argument('--repeats', type=int, default=5, help='Timed batches; the best one counts')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the kernel inputs')
+    parser.add_argument('--save', default=None, help='Write the results as a JSON baseline')
+    parser.add_argument('--baseline', default=None, help='Compare against this JSON baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed relative loss before flagging')
+    args = parser.parse_args()
+
+    if args.list:
+        for name, (unit, sizes, _) in KERNELS.items():
+            print(f"{name:>28} {unit:>10} {sizes}")
+        return 0
+    results = run_benchmarks(args.kernels, args.min_time, args.repeats, args.seed, args.sizes)
+    if args.save:
+        save_baseline(args.save, results)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        print(f"{len(regressions)} regression(s) against {args.baseline}")
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,61 +1,359 @@
 import sys
+import math
+import time
+from itertools import islice
+import argparse
 import numpy as np
-from scipy.special import expit
-import matplotlib.pyplot as plt
-from matplotlib.widgets import Button
 
 W = 0.8
 THETA = 0.0
 
 def sigmoid(x, W, THETA):
-    return (np.exp(W*x + THETA) - np.exp(-(W*x + THETA))) / (np.exp(W*x + THETA) + np.exp(-(W*x + THETA)))
-
-# Generate data points with noise
-np.random.seed(42)
-x_values = np.arange(-5.0, 5.0, 0.2)
-error = 0.05
-y_values = sigmoid(x_values, W, THETA) + error * np.random.normal(size=x_values.shape)
-
-# Plot the initial data
-fig, ax = plt.subplots()
-plt.subplots_adjust(bottom=0.2)
-ax.plot(x_values, y_values, 'bo', label='Data with noise')
-
-# Initial plot of the sigmoid function
-line, = ax.plot(x_values, sigmoid(x_values, W, THETA), 'r-', linewidth=2, label='Sigmoid fit')
-
-def update_plot(event):
-    global W, THETA
-    
-    # Simulate progressive fit (simplified for demonstration purposes)
-    for _ in range(1):  # Single iteration for simplicity
-        for i in range(len(x_values)):
-            xi = x_values[i]
-            yi = y_values[i]
-            sechS = 1.0 / np.cosh(W * xi + THETA)
-            sech2S = sechS**2
-            H = np.array([[sech2S * xi, sech2S]])
-            R_inv = np.array([[1 / (error**2)]])
-            A = np.array([W, THETA])
-            CC = np.eye(2) * 0.5
-            
-            CCP_inv = np.linalg.inv(CC) + H.T @ R_inv @ H
-            CCP = np.linalg.inv(CCP_inv)
-            AP = CCP @ (np.linalg.inv(CC) @ A + H.T @ R_inv @ (H @ A + yi - sigmoid(xi, W, THETA)))
-            
-            W, THETA = AP
-            
-    line.set_ydata(sigmoid(x_values, W, THETA))
-    fig.canvas.draw()
-
-# Add a button for updating the plot
-ax_button = plt.axes([0.81, 0.05, 0.1, 0.075])
-button = Button(ax_button, 'Next')
-button.on_clicked(update_plot)
-
-ax.set_title('Sigmoid')
-ax.set_xlabel('x')
-ax.set_ylabel('y')
-ax.legend()
-plt.show()
+    # (e^s - e^-s) / (e^s + e^-s), without the overflow for large |s|
+    return np.tanh(W*x + THETA)
 
+class SigmoidEKF:
+    """Extended Kalman filter for the parameters (W, THETA) of y = sigmoid(x, W, THETA)
+       with Gaussian noise of standard deviation error. The state is kept in information
+       form, the 2x2 inverse covariance J = C^-1 as its three independent entries, so an
+       update is J += H^T H / error^2 followed by a closed-form 2x2 solve, and J carries
+       over from one measurement to the next. W, THETA and J are arrays of shape `shape`,
+       one independent filter per element, all updated together; with shape () they
+       are numpy scalars, which keeps a single filter cheap. After each update
+       innovation and S hold y minus the prediction and its predicted variance.
+    """
+    def __init__(self, shape=(), W=W, THETA=THETA, C=0.5, error=0.05):
+        self.W = np.full(shape, W, dtype=float)[()]
+        self.THETA = np.full(shape, THETA, dtype=float)[()]
+        self.Jww = np.full(shape, 1 / C, dtype=float)[()]
+        self.Jwt = np.zeros(shape)[()]
+        self.Jtt = np.full(shape, 1 / C, dtype=float)[()]
+        self.error = error
+        self.n = 0
+
+    def update(self, x, y):
+        """One measurement (x, y) per filter, x and y broadcast against shape"""
+        t = np.tanh(self.W * x + self.THETA)
+        ht = 1 - t * t              # d sigmoid / d THETA = sech^2
+        hw = ht * x                 # d sigmoid / d W
+        rinv = 1 / self.error**2
+        det = self.Jww * self.Jtt - self.Jwt * self.Jwt
+        self.innovation = y - t
+        self.S = (hw * hw * self.Jtt - 2 * hw * ht * self.Jwt + ht * ht * self.Jww) / det + self.error**2
+        self.Jww += hw * hw * rinv
+        self.Jwt += hw * ht * rinv
+        self.Jtt += ht * ht * rinv
+        r = self.innovation * rinv
+        gw, gt = hw * r, ht * r
+        det = self.Jww * self.Jtt - self.Jwt * self.Jwt
+        self.W += (self.Jtt * gw - self.Jwt * gt) / det
+        self.THETA += (self.Jww * gt - self.Jwt * gw) / det
+        self.n += 1
+        return self
+
+    def fit(self, x, y):
+        """Run through measurements along the last axis of x and y, one vectorized
+           update per measurement index
+        """
+        x, y = np.broadcast_arrays(x, y)
+        for i in range(x.shape[-1]):
+            self.update(x[..., i], y[..., i])
+        return self
+
+    def fit_iterated(self, x, y, iterations=10):
+        """Batch form of the iterated EKF: all measurements along the last axis at once,
+           relinearised about the latest estimate in every iteration (Gauss-Newton on the
+           posterior, the current state being the prior). Unlike fit, the result does not
+           depend on where the early measurements happened to be linearised.
+        """
+        x, y = np.broadcast_arrays(x, y)
+        W0, THETA0 = self.W, self.THETA
+        Jww0, Jwt0, Jtt0 = self.Jww, self.Jwt, self.Jtt
+        rinv = 1 / self.error**2
+        w, theta = W0, THETA0
+        for _ in range(iterations):
+            t = np.tanh(w[..., None] * x + theta[..., None])
+            ht = 1 - t * t
+            hw = ht * x
+            r = (y - t) * rinv
+            Jww = Jww0 + (hw * hw).sum(axis=-1) * rinv
+            Jwt = Jwt0 + (hw * ht).sum(axis=-1) * rinv
+            Jtt = Jtt0 + (ht * ht).sum(axis=-1) * rinv
+            dw, dt = w - W0, theta - THETA0
+            gw = (hw * r).sum(axis=-1) - (Jww0 * dw + Jwt0 * dt)
+            gt = (ht * r).sum(axis=-1) - (Jwt0 * dw + Jtt0 * dt)
+            det = Jww * Jtt - Jwt * Jwt
+            w = w + (Jtt * gw - Jwt * gt) / det
+            theta = theta + (Jww * gt - Jwt * gw) / det
+        self.W, self.THETA = w[()], theta[()]
+        self.Jww, self.Jwt, self.Jtt = Jww[()], Jwt[()], Jtt[()]
+        self.n += x.shape[-1]
+        return self
+
+    @property
+    def covariance(self):
+        """C = J^-1, shape shape + (2, 2), in the order (W, THETA)"""
+        det = self.Jww * self.Jtt - self.Jwt * self.Jwt
+        return np.stack([np.stack([self.Jtt, -self.Jwt], axis=-1),
+                         np.stack([-self.Jwt, self.Jww], axis=-1)], axis=-2) / det[..., None, None]
+
+    @property
+    def sigma(self):
+        """standard deviations of W and THETA"""
+        det = self.Jww * self.Jtt - self.Jwt * self.Jwt
+        return np.sqrt(self.Jtt / det), np.sqrt(self.Jww / det)
+
+def noisy_data(x, W=W, THETA=THETA, error=0.05, datasets=None, rng=None):
+    """y values of sigmoid plus noise at x, one row per dataset if datasets is given"""
+    rng = np.random.default_rng() if rng is None else rng
+    shape = x.shape if datasets is None else (datasets,) + x.shape
+    return sigmoid(x, W, THETA) + error * rng.normal(size=shape)
+
+def fit_fleet(datasets, x, error=0.05, seed=None):
+    """Fit independent noisy datasets together, with a single EKF pass and with the
+       iterated batch fit, both from W=0.5, THETA=0.5; print the mean estimates, their
+       scatter over the datasets and the ratio of scatter to the filter's own sigma,
+       which is near 1 when the error bars can be trusted.
+    """
+    y = noisy_data(x, W, THETA, error, datasets, np.random.default_rng(seed))
+    fits = {}
+    for name, fit in (('single pass', SigmoidEKF.fit), ('iterated', SigmoidEKF.fit_iterated)):
+        ekf = SigmoidEKF((datasets,), W=0.5, THETA=0.5, C=0.5, error=error)
+        t0 = time.perf_counter()
+        fit(ekf, x, y)
+        seconds = time.perf_counter() - t0
+        sw, st = ekf.sigma
+        print(f"{name}: {datasets} datasets x {len(x)} points in {seconds:.3f} s "
+              f"({datasets * len(x) / seconds / 1e6:.1f} M points/s)")
+        for label, est, sigma, true in (('W    ', ekf.W, sw, W), ('THETA', ekf.THETA, st, THETA)):
+            print(f"  {label} = {est.mean():.5f}  scatter {est.std():.5f}  mean sigma {sigma.mean():.5f}  "
+                  f"scatter/sigma {est.std() / sigma.mean():.2f}  (true {true})")
+        fits[name] = ekf
+    return fits['iterated']
+
+def simulated_measurements(W=W, THETA=THETA, error=0.05, xrange=(-5.0, 5.0), rng=None):
+    """Endless stream of noisy (x, y) measurements at uniformly random x"""
+    rng = np.random.default_rng() if rng is None else rng
+    while True:
+        x = rng.uniform(*xrange, 4096)
+        y = sigmoid(x, W, THETA) + error * rng.normal(size=x.shape)
+        yield from zip(x.tolist(), y.tolist())
+
+def read_measurements(source):
+    """(x, y) pairs from lines "x y" (or "x,y") of a path, '-' for stdin, or any text
+       stream such as sock.makefile('r'); other lines are skipped. A path is opened
+       here and closed once the generator is exhausted or closed; streams are left to
+       the caller.
+    """
+    if isinstance(source, str) and source != '-':
+        with open(source) as stream:
+            yield from read_measurements(stream)
+        return
+    stream = sys.stdin if source == '-' else source
+    for line in stream:
+        fields = line.replace(',', ' ').split()
+        if len(fields) >= 2:
+            try:
+                yield float(fields[0]), float(fields[1])
+            except ValueError:
+                continue
+
+class OnlineSigmoidFitter:
+    """Tracks (W, THETA) over a stream of measurements with a single SigmoidEKF, in
+       constant time and memory per point. Alongside it keeps
+         - a histogram of update latencies in log-spaced bins from 100 ns to 100 ms,
+         - running mean and variance of the normalised innovation (y - prediction)/sqrt(S),
+           which should approach 0 and 1 if the filter is consistent,
+         - convergence: the fit counts as converged after window consecutive updates
+           that each move W and THETA by less than tol times their standard deviations.
+    """
+    LATENCY_DECADES = (-7, -1)
+    BINS_PER_DECADE = 10
+
+    def __init__(self, ekf=None, tol=0.05, window=200):
+        self.ekf = SigmoidEKF() if ekf is None else ekf
+        self.tol = tol
+        self.window = window
+        decades = self.LATENCY_DECADES[1] - self.LATENCY_DECADES[0]
+        self.latency = np.zeros(self.BINS_PER_DECADE * decades, dtype=np.int64)
+        self.n = 0
+        self.zmean = 0.0
+        self.zM2 = 0.0
+        self.streak = 0
+        self.converged_at = None
+
+    def update(self, x, y):
+        t0 = time.perf_counter()
+        ekf = self.ekf
+        W0, THETA0 = ekf.W, ekf.THETA
+        ekf.update(x, y)
+        sw, st = ekf.sigma
+        if abs(ekf.W - W0) < self.tol * sw and abs(ekf.THETA - THETA0) < self.tol * st:
+            self.streak += 1
+            if self.streak >= self.window and self.converged_at is None:
+                self.converged_at = self.n
+        else:
+            self.streak = 0
+            self.converged_at = None
+        self.n += 1
+        z = float(ekf.innovation) / math.sqrt(ekf.S)
+        delta = z - self.zmean
+        self.zmean += delta / self.n
+        self.zM2 += delta * (z - self.zmean)
+        seconds = time.perf_counter() - t0
+        k = int((math.log10(max(seconds, 1e-12)) - self.LATENCY_DECADES[0]) * self.BINS_PER_DECADE)
+        self.latency[min(max(k, 0), len(self.latency) - 1)] += 1
+        return self
+
+    def consume(self, measurements, limit=None, callback=None, every=1000):
+        """Update from an iterable of (x, y), at most limit of them; callback(self) is
+           called every `every` points and at the end. Returns the number consumed.
+        """
+        n0 = self.n
+        for x, y in islice(measurements, limit):
+            self.update(x, y)
+            if callback is not None and (self.n - n0) % every == 0:
+                callback(self)
+        if callback is not None and (self.n - n0) % every != 0:
+            callback(self)
+        return self.n - n0
+
+    @property
+    def converged(self):
+        return self.converged_at is not None
+
+    @property
+    def innovation_std(self):
+        return math.sqrt(self.zM2 / (self.n - 1)) if self.n > 1 else float('nan')
+
+    @property
+    def latency_edges(self):
+        return np.logspace(*self.LATENCY_DECADES, len(self.latency) + 1)
+
+    def latency_percentile(self, q):
+        """upper edge of the latency bin holding the q-th percentile, in seconds"""
+        cumulative = np.cumsum(self.latency)
+        k = np.searchsorted(cumulative, q / 100 * cumulative[-1])
+        return self.latency_edges[min(k, len(self.latency) - 1) + 1]
+
+    def report(self):
+        sw, st = self.ekf.sigma
+        print(f"{self.n:>10} W = {float(self.ekf.W):.5f} +- {float(sw):.5f}"
+              f"  THETA = {float(self.ekf.THETA):.5f} +- {float(st):.5f}"
+              f"  z = {self.zmean:+.3f} / {self.innovation_std:.3f}"
+              f"  p50 {self.latency_percentile(50) * 1e6:.1f} us"
+              f"  p99 {self.latency_percentile(99) * 1e6:.1f} us"
+              f"  {'converged at ' + str(self.converged_at) if self.converged else 'not converged'}")
+
+def stream_plot(fitter, measurements, block=200, xrange=(-5.0, 5.0)):
+    """Live view of a streamed fit: each frame consumes block measurements, shows
+       them and redraws the current sigmoid
+    """
+    import matplotlib.pyplot as plt
+    from matplotlib.animation import FuncAnimation
+    fig, ax = plt.subplots()
+    points, = ax.plot([], [], 'bo', markersize=3, label='Latest measurements')
+    xs = np.linspace(*xrange, 200)
+    line, = ax.plot(xs, sigmoid(xs, fitter.ekf.W, fitter.ekf.THETA), 'r-', linewidth=2, label='Sigmoid fit')
+    ax.set_xlim(*xrange)
+    ax.set_ylim(-1.3, 1.3)
+    ax.set_xlabel('x')
+    ax.set_ylabel('y')
+    ax.legend()
+
+    def frame(_):
+        batch = list(islice(measurements, block))
+        if batch:
+            fitter.consume(iter(batch))
+            points.set_data(*zip(*batch))
+            line.set_ydata(sigmoid(xs, fitter.ekf.W, fitter.ekf.THETA))
+        ax.set_title(f"Sigmoid, {fitter.n} points, W = {float(fitter.ekf.W):.4f}, "
+                     f"THETA = {float(fitter.ekf.THETA):.4f}")
+        return points, line
+
+    anim = FuncAnimation(fig, frame, interval=50, cache_frame_data=False)
+    plt.show()
+    return anim
+
+def main():
+    parser = argparse.ArgumentParser(description="Extended Kalman fit of a sigmoid to noisy data")
+    parser.add_argument('--datasets', type=int, default=0, help='Fit this many independent datasets headless')
+    parser.add_argument('--seed', type=int, default=None, help='Seed for the --datasets and --stream noise')
+    parser.add_argument('--stream', type=int, default=None, metavar='N',
+                        help='Fit N streamed measurements online (0: no limit)')
+    parser.add_argument('--source', default=None,
+                        help='Read "x y" lines from this file (- for stdin) instead of simulating')
+    parser.add_argument('--report', type=int, default=100000, help='Print the online fit every this many points')
+    parser.add_argument('--tol', type=float, default=0.05, help='Convergence: largest step in units of sigma')
+    parser.add_argument('--window', type=int, default=200, help='Convergence: consecutive small steps needed')
+    parser.add_argument('--gui', action='store_true', help='Show the online fit live')
+    parser.add_argument('--headless', action='store_true',
+                        help='Fit the demo data in one pass and print the result')
+    args = parser.parse_args()
+
+    # Generate data points with noise
+    x_values = np.arange(-5.0, 5.0, 0.2)
+    error = 0.05
+    if args.datasets:
+        fit_fleet(args.datasets, x_values, error, args.seed)
+        return
+    if args.stream is not None or args.source is not None:
+        if args.source is not None:
+            measurements = read_measurements(args.source)
+        else:
+            measurements = simulated_measurements(W, THETA, error, rng=np.random.default_rng(args.seed))
+        fitter = OnlineSigmoidFitter(SigmoidEKF(W=0.5, THETA=0.5, error=error), args.tol, args.window)
+        if args.gui:
+            stream_plot(fitter, islice(measurements, args.stream or None))
+        else:
+            fitter.consume(measurements, args.stream or None, lambda f: f.report(), args.report)
+        return
+
+    y_values = noisy_data(x_values, W, THETA, error, rng=np.random.default_rng(42))
+    ekf = SigmoidEKF(W=W, THETA=THETA, error=error)
+    if args.headless:
+        ekf.fit(x_values, y_values)
+        sw, st = ekf.sigma
+        print(f"W = {ekf.W:.4f} +- {sw:.4f}, THETA = {ekf.THETA:.4f} +- {st:.4f}")
+        return
+
+    import matplotlib.pyplot as plt
+    from matplotlib.widgets import Button
+
+    # Plot the initial data
+    fig, ax = plt.subplots()
+    plt.subplots_adjust(bottom=0.2)
+    ax.plot(x_values, y_values, 'bo', label='Data with noise')
+
+    # Initial plot of the sigmoid function
+    line, = ax.plot(x_values, sigmoid(x_values, ekf.W, ekf.THETA), 'r-', linewidth=2, label='Sigmoid fit')
+
+    passes = [0]
+
+    def update_plot(event):
+        # one more pass over the same data. The filter treats the repeated points as new
+        # measurements, so its sigma only means something after the first pass.
+        ekf.fit(x_values, y_values)
+        passes[0] += 1
+        if passes[0] == 1:
+            sw, st = ekf.sigma
+            print(f"pass 1: W = {ekf.W:.4f} +- {sw:.4f}, THETA = {ekf.THETA:.4f} +- {st:.4f}")
+        else:
+            print(f"pass {passes[0]}: W = {ekf.W:.4f}, THETA = {ekf.THETA:.4f} (data reused, no error bars)")
+        ax.set_title(f'Sigmoid, pass {passes[0]}')
+        line.set_ydata(sigmoid(x_values, ekf.W, ekf.THETA))
+        fig.canvas.draw()
+
+    # Add a button for updating the plot
+    ax_button = plt.axes([0.81, 0.05, 0.1, 0.075])
+    button = Button(ax_button, 'Next')
+    button.on_clicked(update_plot)
+
+    ax.set_title('Sigmoid')
+    ax.set_xlabel('x')
+    ax.set_ylabel('y')
+    ax.legend()
+    plt.show()
+
+if __name__ == "__main__":
+    main()
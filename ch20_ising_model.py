@@ -1,10 +1,18 @@
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
+from mc_stats import autocorrelation_time
 
 class IsingModelWidget:
-    def __init__(self, model):
+    def __init__(self, model, per_sweep=False):
+        import matplotlib.pyplot as plt
+        from matplotlib.animation import FuncAnimation
         self.model = model
+        self.per_sweep = per_sweep # one frame per lattice sweep rather than per spin
         self.fig, self.ax = plt.subplots()
         self.image = self.ax.imshow(model.array, cmap='gray', vmin=-1, vmax=1)
         #self.animation = FuncAnimation(self.fig, self.update, frames=200, interval=50, repeat=False)
@@ -12,46 +20,58 @@ class IsingModelWidget:
         plt.show()
 
     def update(self, frame):
-        self.model.next()
+        if self.per_sweep:
+            self.model.step()
+        else:
+            self.model.next()
         self.image.set_data(self.model.array)
+        N = self.model.NX * self.model.NY
+        self.ax.set_title(f"Temp {self.model.tau}, Mag {self.model.m/N:.4f}, Energy {self.model.u/N:.4f}")
         return self.image,
 
 class IsingModel:
-    def __init__(self, NX=400, NY=400, tau=5.0):
+    UPDATES = ('metropolis', 'wolff', 'sw')
+    LATTICE = 'array'    # attribute holding the lattice state
+
+    def __init__(self, NX=400, NY=400, tau=5.0, seed=None, update='metropolis'):
+        if update not in self.UPDATES:
+            raise ValueError(f"unknown update {update!r}, expected one of {self.UPDATES}")
         self.NX = NX     # x-dimension
         self.NY = NY
         self.tau = tau   # temperature
         self.eps = -1    # ferromagnet. Not antiferromagnet.
-        self.array = np.zeros((NX, NY), dtype=int)
-        self.m = 0       # magnetisation
-        self.u = 0.0     # internal energy
-
-        # Initialize spins randomly and compute magnetization
-        self.m = 0
-        self.u = 0.0
-        for i in range(self.NX):
-            for j in range(self.NY):
-                x = 1 if np.random.rand()>0.5 else -1
-                self.array[i,j]=x
-                self.m+=x
-                for ip in range(i-1, i+2):
-                    IP = ip % self.NX   # neighbour
-                    for jp in range(j-1, j+2):
-                        JP = jp % self.NY # neighbour
-                        self.u += self.eps * self.array[i, j] * self.array[IP, JP]
-                        # This works because the energy is only counted when both
-                        # spins in the pair are initialized.  Before that, one of
-                        # the indices is zero and will give no contribution.
- 
+        self.update = update
+        self.steps = 0   # calls to step()
+        self.cluster_sizes = np.zeros(0, dtype=int) # clusters flipped by the last cluster step
+        self.rng = np.random.default_rng(seed)
+        self._sublattices = None
+        self._incluster = None
+        # Initialize spins randomly and compute magnetization and energy
+        self.array = np.where(self.rng.random((NX, NY)) > 0.5, 1, -1)
+        self.m = self.magnetization()  # magnetisation
+        self.u = self.energy()         # internal energy
+
+    def magnetization(self):
+        """total magnetisation recomputed from the lattice"""
+        return int(self.array.sum())
+
+    def energy(self):
+        """internal energy recomputed from the lattice, each nearest-neighbour bond counted once"""
+        s = self.array
+        return float(self.eps * np.sum(s * (np.roll(s, -1, axis=0) + np.roll(s, -1, axis=1))))
+
+    def verify(self):
+        """check the incremental m and u against a full recomputation"""
+        m, u = self.magnetization(), self.energy()
+        if self.m != m or self.u != u:
+            raise RuntimeError(f"bookkeeping drift: m {self.m} != {m} or u {self.u} != {u}")
 
     def next(self):
         if self.tau == 0.0:
             return
 
-        N=self.NX*self.NY
-        print(f"Temp {self.tau}, Mag {self.m/N}, Energy {self.u/N}")
-        i = np.random.randint(0, self.NX)
-        j = np.random.randint(0, self.NY)
+        i = self.rng.integers(0, self.NX)
+        j = self.rng.integers(0, self.NY)
 
         dE = 0
         for d in [-1, 1]:
@@ -59,14 +79,593 @@ class IsingModel:
             dE -= self.eps * self.array[i, j] * self.array[i, (j+d) % self.NY]
 
         # Hastings-Metropolis 
-        if dE <= 0 or np.exp(-dE / self.tau) > np.random.rand():
+        if dE <= 0 or np.exp(-dE / self.tau) > self.rng.random():
             self.array[i, j] *= -1
             self.m += 2 * self.array[i, j]
             #self.u -= 2 * dE
             self.u += 2 * dE
 
+    def sweep(self):
+        """One Metropolis sweep: update the two checkerboard sublattices in turn.
+           Sites of one colour have no neighbours of the same colour, so all of
+           them can be updated at once with the same acceptance rule as next().
+        """
+        if self.tau == 0.0:
+            return
+        if self.NX % 2 or self.NY % 2:
+            raise ValueError("checkerboard sweep needs even NX and NY")
+
+        s = self.array
+        for mask in self.sublattices():
+            nsum = (np.roll(s, 1, axis=0) + np.roll(s, -1, axis=0) +
+                    np.roll(s, 1, axis=1) + np.roll(s, -1, axis=1))
+            dE = -self.eps * s * nsum
+            flip = mask & ((dE <= 0) | (np.exp(-dE / self.tau) > self.rng.random(s.shape)))
+            self.m -= 2 * int(s[flip].sum())
+            self.u += 2 * int(dE[flip].sum())
+            s[flip] *= -1
+
+    @property
+    def beta(self):
+        """inverse temperature of the weight exp(-beta*u) sampled by next()"""
+        return 1.0 / (2.0 * self.tau)
+
+    def step(self):
+        """One update of the selected kind: a checkerboard sweep, a Wolff
+           single-cluster flip or a Swendsen-Wang sweep.
+        """
+        match self.update:
+            case 'metropolis': self.sweep()
+            case 'wolff': self.wolff()
+            case 'sw': self.swendsen_wang()
+        self.steps += 1
+
+    def wolff(self):
+        """Grow the cluster of one random seed site and flip it. Each round bonds the
+           frontier to its aligned neighbours outside the cluster with probability
+           1-exp(-1/tau), so the cost is proportional to the cluster, not the lattice.
+        """
+        if self.tau == 0.0:
+            return
+        s = self.array.reshape(-1)
+        if self._incluster is None:
+            self._incluster = np.zeros(s.size, dtype=bool)
+        inside = self._incluster
+        p = 1.0 - np.exp(-1.0 / self.tau)
+        frontier = self.rng.integers(0, s.size, 1)
+        spin = s[frontier[0]]
+        inside[frontier] = True
+        cluster = [frontier]
+        while frontier.size:
+            nb = self.neighbours(frontier).ravel()
+            nb = nb[(s[nb] == spin) & ~inside[nb]]
+            frontier = np.unique(nb[self.rng.random(nb.size) < p])
+            inside[frontier] = True
+            cluster.append(frontier)
+        cluster = np.concatenate(cluster)
+        # bonds from the cluster to the outside change sign
+        nb = self.neighbours(cluster)
+        self.u -= 2 * self.eps * int(spin) * int(s[nb][~inside[nb]].sum())
+        self.m -= 2 * int(spin) * cluster.size
+        s[cluster] = -spin
+        inside[cluster] = False
+        self.array = s.reshape(self.NX, self.NY)
+        self.cluster_sizes = np.array([cluster.size])
+
+    def neighbours(self, k):
+        """flat indices of the four periodic neighbours of flat sites k, shape (len(k), 4)"""
+        i, j = np.divmod(k, self.NY)
+        return np.stack([((i + 1) % self.NX) * self.NY + j, ((i - 1) % self.NX) * self.NY + j,
+                         i * self.NY + (j + 1) % self.NY, i * self.NY + (j - 1) % self.NY], axis=1)
+
+    def swendsen_wang(self):
+        """Flip every cluster independently with probability 1/2"""
+        if self.tau == 0.0:
+            return
+        n, labels = self.clusters()
+        self.cluster_sizes = np.bincount(labels, minlength=n)
+        flip = (self.rng.random(n) < 0.5)[labels].reshape(self.NX, self.NY)
+        self.flip(flip)
+
+    def clusters(self):
+        """Fortuin-Kasteleyn clusters: aligned neighbours are bonded with
+           probability 1-exp(-1/tau), the weight matching the acceptance rule
+           of next(). Returns (number of clusters, flat label array).
+        """
+        from scipy.sparse import coo_matrix
+        from scipy.sparse.csgraph import connected_components
+        s = self.array
+        p = 1.0 - np.exp(-1.0 / self.tau)
+        idx = np.arange(s.size).reshape(s.shape)
+        rows, cols = [], []
+        for axis in (0, 1):
+            bond = (s == np.roll(s, -1, axis=axis)) & (self.rng.random(s.shape) < p)
+            rows.append(idx[bond])
+            cols.append(np.roll(idx, -1, axis=axis)[bond])
+        rows = np.concatenate(rows)
+        cols = np.concatenate(cols)
+        graph = coo_matrix((np.ones(rows.size, dtype=np.int8), (rows, cols)), shape=(s.size, s.size))
+        return connected_components(graph, directed=False)
+
+    def flip(self, mask):
+        """Flip the spins in mask, updating m and u from the broken/restored bonds"""
+        s = self.array
+        for axis in (0, 1):
+            cross = mask ^ np.roll(mask, -1, axis=axis)   # bonds with exactly one end flipped
+            self.u -= 2 * self.eps * int((s * np.roll(s, -1, axis=axis))[cross].sum())
+        self.m -= 2 * int(s[mask].sum())
+        s[mask] *= -1
+
+    def sublattices(self):
+        """boolean masks of the two checkerboard colours"""
+        if self._sublattices is None:
+            i, j = np.indices((self.NX, self.NY))
+            even = (i + j) % 2 == 0
+            self._sublattices = (even, ~even)
+        return self._sublattices
+
+def popcount(x):
+    """total number of set bits in a uint64 array"""
+    if hasattr(np, 'bitwise_count'):
+        return int(np.bitwise_count(x).sum(dtype=np.int64))
+    return int(POPCOUNT8[x.view(np.uint8)].sum(dtype=np.int64))
+
+POPCOUNT8 = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1)
+
+class PackedIsingModel:
+    """Multi-spin coded lattice: 64 spins per uint64 word along y, bit set = spin up.
+       Checkerboard Metropolis sweeps are done with bitwise ops on whole words,
+       with the same acceptance rule as IsingModel.next(). The +-1 array view
+       is only decoded on demand. If NY is not a multiple of 64 the last word of
+       each row is padded; the padding bits are kept at zero and masked out.
+    """
+    LATTICE = 'words'
+    EVEN = np.uint64(0x5555555555555555) # bits with even j
+    ODD = ~EVEN
+    PBITS = 32                           # binary digits of the acceptance probability
+
+    def __init__(self, NX=400, NY=400, tau=5.0, seed=None):
+        if NX % 2 or NY % 2:
+            raise ValueError("packed lattice needs even NX and NY")
+        self.NX = NX
+        self.NY = NY
+        self.tau = tau
+        self.eps = -1
+        self.update = 'metropolis'
+        self.steps = 0
+        self.cluster_sizes = np.zeros(0, dtype=int)
+        self.rng = np.random.default_rng(seed)
+        nwords = -(-NY // 64)
+        self.tail = NY - 64 * (nwords - 1)   # spins in the last word of a row
+        self.valid = np.full(nwords, ~np.uint64(0))
+        self.valid[-1] >>= np.uint64(64 - self.tail)
+        self.words = self.rng.bit_generator.random_raw((NX, nwords)) & self.valid
+        self.m = self.magnetization()
+        self.u = self.energy()
+
+    def magnetization(self):
+        return 2 * popcount(self.words) - self.NX * self.NY
+
+    def energy(self):
+        s = self.words
+        anti = popcount((s ^ self.right(s)) & self.valid) + popcount(s ^ np.roll(s, -1, axis=0))
+        return float(self.eps * (2 * self.NX * self.NY - 2 * anti))
+
+    verify = IsingModel.verify
+
+    @property
+    def array(self):
+        """+-1 spins decoded from the packed words"""
+        bits = np.unpackbits(self.words.astype('<u8').view(np.uint8), axis=1, bitorder='little')
+        return 2 * bits[:, :self.NY].astype(int) - 1
+
+    def right(self, x):
+        """spins at j+1 (bit b of word w holds column 64*w+b); padding bits are not valid"""
+        r = (x >> np.uint64(1)) | (np.roll(x, -1, axis=1) << np.uint64(63))
+        if self.tail < 64:
+            # column NY-1 wraps to bit 0 of the first word
+            t = np.uint64(self.tail - 1)
+            r[:, -1] = (x[:, -1] >> np.uint64(1)) | ((x[:, 0] & np.uint64(1)) << t)
+        return r
+
+    def left(self, x):
+        """spins at j-1; padding bits are not valid"""
+        r = (x << np.uint64(1)) | (np.roll(x, 1, axis=1) >> np.uint64(63))
+        if self.tail < 64:
+            # column 0 wraps to the last valid bit of the last word
+            r[:, 0] = (x[:, 0] << np.uint64(1)) | ((x[:, -1] >> np.uint64(self.tail - 1)) & np.uint64(1))
+        return r
+
+    def bernoulli(self, p):
+        """words whose bits are independently set with probability p,
+           built from the binary expansion of p (PBITS digits)
+        """
+        w = np.zeros_like(self.words)
+        digits = int(p * 2**self.PBITS)
+        for k in range(self.PBITS):     # least significant digit first
+            if digits >> k & 1:
+                w |= self.rng.bit_generator.random_raw(w.shape)
+            elif w.any():
+                w &= self.rng.bit_generator.random_raw(w.shape)
+        return w
+
+    def sweep(self):
+        if self.tau == 0.0:
+            return
+        s = self.words
+        # checkerboard masks: even rows take the even columns
+        rows = np.where(np.arange(self.NX) % 2 == 0, self.EVEN, self.ODD)[:, None]
+        p = np.exp(-2.0 / self.tau)     # acceptance for dE = 2; dE = 4 accepts with p**2
+        for mask in (rows, ~rows):
+            # anti-aligned neighbours, summed in bit slices: k = s1 + s2 + 2*(c1 + c2)
+            a1 = s ^ np.roll(s, 1, axis=0)
+            a2 = s ^ np.roll(s, -1, axis=0)
+            a3 = s ^ self.left(s)
+            a4 = s ^ self.right(s)
+            s1, c1 = a1 ^ a2, a1 & a2
+            s2, c2 = a3 ^ a4, a3 & a4
+            ge2 = c1 | c2 | (s1 & s2)     # dE <= 0
+            eq1 = (s1 ^ s2) & ~(c1 | c2)  # dE = 2
+            eq0 = ~(s1 | s2 | c1 | c2)    # dE = 4
+            b1 = self.bernoulli(p)
+            flip = mask & self.valid & (ge2 | ((eq1 | (eq0 & self.bernoulli(p))) & b1))
+
+            nflip = popcount(flip)
+            self.m -= 2 * (2 * popcount(flip & s) - nflip)
+            nanti = popcount(flip & s1) + popcount(flip & s2) + 2 * (popcount(flip & c1) + popcount(flip & c2))
+            self.u += 2 * (4 * nflip - 2 * nanti)
+            s ^= flip
+
+    def step(self):
+        self.sweep()
+        self.steps += 1
+
+class Checkpoint:
+    """Checkpoint of a model: tau, m, u, the step count and the RNG state in
+       <path>.json, and the lattice in one of two memory-mapped files, <path>.a.npy
+       and <path>.b.npy, named by the JSON. A save writes the file that is not
+       current, only the rows that differ from its contents, and then atomically
+       replaces the JSON to point at it, so a crash at any moment leaves the
+       previous lattice and metadata intact.
+    """
+    def __init__(self, path):
+        self.lattice_paths = {'a': path + '.a.npy', 'b': path + '.b.npy'}
+        self.meta_path = path + '.json'
+        self.mm = {}
+        self.current = None
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path) as f:
+                self.current = json.load(f)['lattice']
+
+    def save(self, model):
+        lattice = getattr(model, model.LATTICE)
+        target = 'b' if self.current == 'a' else 'a'
+        mm = self.mm.get(target)
+        if mm is None or mm.shape != lattice.shape or mm.dtype != lattice.dtype:
+            mm = np.lib.format.open_memmap(self.lattice_paths[target], mode='w+', dtype=lattice.dtype,
+                                           shape=lattice.shape)
+            mm[...] = lattice
+            self.mm[target] = mm
+        else:
+            changed = np.any(mm != lattice, axis=1)
+            mm[changed] = lattice[changed]
+        mm.flush()
+
+        meta = {
+            'model': type(model).__name__,
+            'NX': model.NX, 'NY': model.NY, 'tau': model.tau, 'update': model.update,
+            'm': int(model.m), 'u': float(model.u), 'steps': model.steps,
+            'rng': model.rng.bit_generator.state,
+            'lattice': target,
+        }
+        tmp = self.meta_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(meta, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.meta_path)   # the commit point: until here the old pair is current
+        self.current = target
+
+    def load(self, seed=None, tau=None):
+        """Restore the model bit-identically, or fork it: a new seed replaces
+           the saved RNG state and tau may be changed.
+        """
+        with open(self.meta_path) as f:
+            meta = json.load(f)
+        if meta['model'] == 'PackedIsingModel':
+            model = PackedIsingModel(NX=meta['NX'], NY=meta['NY'], tau=meta['tau'], seed=seed)
+        else:
+            model = IsingModel(NX=meta['NX'], NY=meta['NY'], tau=meta['tau'], seed=seed, update=meta['update'])
+        setattr(model, model.LATTICE, np.array(np.load(self.lattice_paths[meta['lattice']], mmap_mode='r')))
+        model.m = meta['m']
+        model.u = meta['u']
+        model.steps = meta['steps']
+        model.verify()     # the lattice and metadata come from the same save
+        if seed is None:
+            model.rng.bit_generator.state = meta['rng']
+        if tau is not None:
+            model.tau = tau
+        return model
+
+def measure(model, nsteps, nequil=100):
+    """Run headless and report cluster sizes and the autocorrelation time of |m|"""
+    N = model.NX * model.NY
+    for _ in range(nequil):
+        model.step()
+    mags = np.zeros(nsteps)
+    sizes = []
+    t0 = time.perf_counter()
+    for k in range(nsteps):
+        model.step()
+        mags[k] = abs(model.m) / N
+        sizes.append(model.cluster_sizes)
+    dt = (time.perf_counter() - t0) / nsteps
+    tau_int = autocorrelation_time(mags)
+    sizes = np.concatenate(sizes)
+    clusters = f"mean cluster {sizes.mean():.1f}, " if sizes.size else ""
+    print(f"update {model.update}, Temp {model.tau}, <|m|> {mags.mean():.4f}, "
+          f"{clusters}tau_int {tau_int:.2f} steps, "
+          f"{dt*1e3:.3f} ms/step, {2*tau_int*dt*1e3:.3f} ms/independent sample")
+    return mags, sizes, tau_int
+
+class ObservableRecorder:
+    """Records observables every stride steps into a preallocated array (an
+       .npy memmap when path is given), flushed one chunk at a time. Each
+       flushed chunk also feeds running means and an online binning analysis:
+       level l holds the means of blocks of 2**l records.
+    """
+    def __init__(self, capacity, names=('m', 'u'), path=None, stride=1, chunk=4096):
+        self.names = names
+        self.stride = stride
+        self.capacity = capacity
+        shape = (capacity, len(names))
+        if path is None:
+            self.data = np.empty(shape)
+        else:
+            self.data = np.lib.format.open_memmap(path, mode='w+', dtype=float, shape=shape)
+        self.buffer = np.empty((chunk, len(names)))
+        self.nbuf = 0      # records waiting in the buffer
+        self.n = 0         # records flushed to data
+        self.steps = 0
+        self.levels = []   # per level: [count, mean, M2]
+        self.carry = []    # per level: unpaired block mean left over from the last chunk
+
+    def record(self, *values):
+        if self.steps % self.stride == 0:
+            self.buffer[self.nbuf] = values
+            self.nbuf += 1
+            if self.nbuf == len(self.buffer) or self.n + self.nbuf == self.capacity:
+                self.flush()
+        self.steps += 1
+
+    def flush(self):
+        x = self.buffer[:self.nbuf]
+        if self.n + len(x) > self.capacity:
+            raise ValueError(f"recorder capacity {self.capacity} exceeded")
+        self.data[self.n:self.n + len(x)] = x
+        self.n += len(x)
+        self.nbuf = 0
+        if isinstance(self.data, np.memmap):
+            self.data.flush()
+
+        level = 0
+        while len(x):
+            if level == len(self.levels):
+                self.levels.append([0, np.zeros(x.shape[1]), np.zeros(x.shape[1])])
+                self.carry.append(x[:0])
+            self.merge(self.levels[level], x)
+            x = np.concatenate([self.carry[level], x])
+            npairs = len(x) // 2
+            self.carry[level] = x[2*npairs:]
+            x = x[:2*npairs].reshape(npairs, 2, x.shape[1]).mean(axis=1)
+            level += 1
+
+    @staticmethod
+    def merge(acc, x):
+        """Chan et al. pairwise update of [count, mean, M2] with the rows of x"""
+        n, mean, M2 = acc
+        nx = len(x)
+        mx = x.mean(axis=0)
+        delta = mx - mean
+        acc[0] = n + nx
+        acc[1] = mean + delta * nx / acc[0]
+        acc[2] = M2 + ((x - mx)**2).sum(axis=0) + delta**2 * n * nx / acc[0]
+
+    def close(self):
+        if self.nbuf:
+            self.flush()
+
+    def errors(self, min_blocks=32):
+        """Naive standard error of the mean at every binning level with at least min_blocks blocks"""
+        return np.array([np.sqrt(M2 / (n - 1) / n) for n, _, M2 in self.levels if n >= min_blocks])
+
+    def summary(self, min_blocks=32):
+        """name -> (mean, binned error, integrated autocorrelation time in records)"""
+        if not self.levels:
+            return {}
+        err = self.errors(min_blocks)
+        mean = self.levels[0][1]
+        if len(err) == 0:
+            return {name: (mean[k], np.nan, np.nan) for k, name in enumerate(self.names)}
+        # the largest level still holding min_blocks blocks approximates the plateau
+        plateau = err[-1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            tau_int = 0.5 * (plateau / err[0])**2
+        return {name: (mean[k], plateau[k], tau_int[k]) for k, name in enumerate(self.names)}
+
+def production(model, nsteps, path=None, stride=1, checkpoint=None, checkpoint_every=1000):
+    """Headless production run recording m/N and u/N into an ObservableRecorder,
+       saving a Checkpoint every checkpoint_every steps when one is given
+    """
+    N = model.NX * model.NY
+    recorder = ObservableRecorder(nsteps // stride + (nsteps % stride > 0), path=path, stride=stride)
+    for k in range(nsteps):
+        model.step()
+        recorder.record(model.m / N, model.u / N)
+        if checkpoint is not None and (k + 1) % checkpoint_every == 0:
+            checkpoint.save(model)
+    recorder.close()
+    for name, (mean, err, tau_int) in recorder.summary().items():
+        print(f"{name}: {mean:.6f} +- {err:.6f}, tau_int {tau_int:.2f} records")
+    return recorder
+
+OBSERVABLES = ('m', 'e', 'C', 'chi')
+TABLE = np.dtype([('tau', float)] + [(f, float) for o in OBSERVABLES for f in (o, o + '_err')])
+
+def jackknife(f, *series, nbins=32):
+    """Estimate and binned jackknife error of f(*series) for correlated series"""
+    n = len(series[0]) // nbins * nbins
+    if n == 0:
+        return f(*series), np.nan
+    bins = [np.asarray(x[:n]).reshape(nbins, -1) for x in series]
+    est = []
+    for k in range(nbins):
+        keep = np.ones(nbins, dtype=bool)
+        keep[k] = False
+        est.append(f(*[b[keep].ravel() for b in bins]))
+    est = np.array(est)
+    return f(*series), np.sqrt((nbins - 1) * np.mean((est - est.mean())**2))
+
+def observables(tau, mags, energies, N):
+    """Table row from per-step |m| and u/N series at one temperature"""
+    beta = 1.0 / (2.0 * tau)
+    row = np.zeros((), dtype=TABLE)
+    row['tau'] = tau
+    row['m'], row['m_err'] = jackknife(np.mean, mags)
+    row['e'], row['e_err'] = jackknife(np.mean, energies)
+    row['C'], row['C_err'] = jackknife(lambda e: N * beta**2 * np.var(e), energies)
+    row['chi'], row['chi_err'] = jackknife(lambda m: N * beta * np.var(m), mags)
+    return row
+
+def advance(model, nsteps, verify_every=1000):
+    """Run nsteps updates, returning the model and its |m|, u per-site series.
+       The incremental bookkeeping is checked every verify_every steps.
+    """
+    N = model.NX * model.NY
+    mags = np.zeros(nsteps)
+    energies = np.zeros(nsteps)
+    for k in range(nsteps):
+        model.step()
+        if verify_every and (k + 1) % verify_every == 0:
+            model.verify()
+        mags[k] = abs(model.m) / N
+        energies[k] = model.u / N
+    return model, mags, energies
+
+def run_temperature(NX, NY, tau, seed, update, nequil, nsteps):
+    """One independent run at a single temperature (process pool worker)"""
+    model = IsingModel(NX=NX, NY=NY, tau=tau, seed=seed, update=update)
+    advance(model, nequil)
+    _, mags, energies = advance(model, nsteps)
+    return observables(tau, mags, energies, NX * NY)
+
+def temperature_sweep(taus, NX=64, NY=64, update='metropolis', nequil=1000, nsteps=10000,
+                      seed=None, workers=None):
+    """Independent runs at each temperature, spread over a process pool.
+       Every run gets its own SeedSequence child so the streams are independent.
+    """
+    seeds = np.random.SeedSequence(seed).spawn(len(taus))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        rows = pool.map(run_temperature, [NX]*len(taus), [NY]*len(taus), taus, seeds,
+                        [update]*len(taus), [nequil]*len(taus), [nsteps]*len(taus))
+        return np.array(list(rows), dtype=TABLE)
+
+def parallel_tempering(taus, NX=64, NY=64, update='metropolis', nequil=1000, nsteps=10000,
+                       sweeps_per_exchange=10, seed=None, workers=None):
+    """Replica exchange: one replica per temperature advanced in parallel, with
+       configuration swaps between neighbouring temperatures after every
+       sweeps_per_exchange steps.
+    """
+    taus = np.sort(np.asarray(taus, dtype=float))
+    K = len(taus)
+    N = NX * NY
+    ss = np.random.SeedSequence(seed)
+    rng = np.random.default_rng(ss.spawn(1)[0])
+    models = [IsingModel(NX=NX, NY=NY, tau=t, seed=s, update=update) for t, s in zip(taus, ss.spawn(K))]
+    nrounds = (nequil + nsteps) // sweeps_per_exchange
+    nequil_rounds = nequil // sweeps_per_exchange
+    mags = [[] for _ in range(K)]
+    energies = [[] for _ in range(K)]
+    accepted = np.zeros(K - 1)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for r in range(nrounds):
+            results = list(pool.map(advance, models, [sweeps_per_exchange]*K))
+            models = [model for model, _, _ in results]
+            if r >= nequil_rounds:
+                for k, (_, mk, ek) in enumerate(results):
+                    mags[k].append(mk)
+                    energies[k].append(ek)
+            # alternate even/odd neighbour pairs
+            for k in range(r % 2, K - 1, 2):
+                a, b = models[k], models[k + 1]
+                if np.log(rng.random()) < (a.beta - b.beta) * (a.u - b.u):
+                    a.array, b.array = b.array, a.array
+                    a.m, b.m = b.m, a.m
+                    a.u, b.u = b.u, a.u
+                    accepted[k] += 1
+    attempts = np.array([len(range(k % 2, nrounds, 2)) for k in range(K - 1)])
+    print("swap acceptance: " + " ".join(f"{a:.2f}" for a in accepted / np.maximum(attempts, 1)))
+    return np.array([observables(taus[k], np.concatenate(mags[k]), np.concatenate(energies[k]), N)
+                     for k in range(K)], dtype=TABLE)
+
+def print_table(table):
+    print(" ".join(f"{name:>10}" for name in table.dtype.names))
+    for row in table:
+        print(" ".join(f"{row[name]:10.5f}" for name in table.dtype.names))
+
 if __name__ == "__main__":
-    #model = IsingModel(NX=100, NY=100, tau=2.0)
-    model = IsingModel(NX=100, NY=100, tau=0.5)
-    widget = IsingModelWidget(model)
+    parser = argparse.ArgumentParser(description="Ising model")
+    parser.add_argument('--NX', type=int, default=100, help='Lattice size in x')
+    parser.add_argument('--NY', type=int, default=100, help='Lattice size in y')
+    parser.add_argument('--tau', type=float, default=0.5, help='Temperature')
+    parser.add_argument('--update', choices=IsingModel.UPDATES, default='metropolis', help='Update algorithm')
+    parser.add_argument('--packed', action='store_true',
+                        help='Use the bit-packed lattice (metropolis sweeps only)')
+    parser.add_argument('--measure', type=int, default=0,
+                        help='Run this many steps headless and report autocorrelation')
+    parser.add_argument('--taus', type=float, nargs='+', help='Headless temperature sweep over these temperatures')
+    parser.add_argument('--pt', action='store_true', help='Use parallel tempering for the temperature sweep')
+    parser.add_argument('--nequil', type=int, default=1000, help='Equilibration steps per temperature')
+    parser.add_argument('--nsteps', type=int, default=10000, help='Measurement steps per temperature')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Number of worker processes')
+    parser.add_argument('--seed', type=int, default=None, help='Root seed for the RNG streams')
+    parser.add_argument('--out', default=None, help='Write the table of observables to this CSV file')
+    parser.add_argument('--record', default=None,
+                        help='Headless production run of --nsteps, recording m and u to this .npy file')
+    parser.add_argument('--stride', type=int, default=1, help='Record every stride steps')
+    parser.add_argument('--checkpoint', default=None,
+                        help='Checkpoint the --record run to this path (.json, .a.npy, .b.npy)')
+    parser.add_argument('--checkpoint-every', type=int, default=1000, help='Steps between checkpoints')
+    parser.add_argument('--restart', default=None, help='Start from this checkpoint (forked if --seed is given)')
+    parser.add_argument('--headless', action='store_true',
+                        help='No display: run --nsteps steps and report instead')
+    args = parser.parse_args()
+
+    if args.taus:
+        sweep = parallel_tempering if args.pt else temperature_sweep
+        t0 = time.perf_counter()
+        table = sweep(args.taus, NX=args.NX, NY=args.NY, update=args.update, nequil=args.nequil,
+                      nsteps=args.nsteps, seed=args.seed, workers=args.workers)
+        print_table(table)
+        print(f"{len(args.taus)} temperatures on {args.workers} workers in {time.perf_counter()-t0:.1f}s")
+        if args.out:
+            np.savetxt(args.out, table, delimiter=',', header=','.join(table.dtype.names), fmt='%.8g')
+        sys.exit(0)
+
+    if args.restart:
+        model = Checkpoint(args.restart).load(seed=args.seed)
+        args.nequil = 0
+    elif args.packed:
+        model = PackedIsingModel(NX=args.NX, NY=args.NY, tau=args.tau, seed=args.seed)
+    else:
+        model = IsingModel(NX=args.NX, NY=args.NY, tau=args.tau, seed=args.seed, update=args.update)
+    if args.record:
+        advance(model, args.nequil)
+        checkpoint = Checkpoint(args.checkpoint) if args.checkpoint else None
+        production(model, args.nsteps, path=args.record, stride=args.stride,
+                   checkpoint=checkpoint, checkpoint_every=args.checkpoint_every)
+    elif args.measure or args.headless:
+        measure(model, args.measure or args.nsteps)
+    else:
+        widget = IsingModelWidget(model, per_sweep=True)
 
@@ -1,27 +1,188 @@
+import time
+import argparse
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
-from scipy.stats import expon, gamma
-
-def calculate_integral(distribution, N=10000):
-    samples = distribution.rvs(size=N)
-    f = samples**2 if distribution.dist.name == 'expon' else samples
-    sum_f = np.sum(f)
-    sum_f2 = np.sum(f**2)
-    fBar = sum_f / N
-    f2Bar = sum_f2 / N
-    sigma = np.sqrt((f2Bar - fBar**2) / N)
-    return fBar, sigma
 
-def main():
-    N = 10000
+def square(x):
+    return x**2
+
+def identity(x):
+    return x
+
+METHODS = ('plain', 'importance', 'stratified', 'antithetic', 'sobol', 'halton')
+
+def mean_sigma(f):
+    """mean and its standard error, two-pass variance (no f2Bar - fBar**2 cancellation)"""
+    return np.mean(f), np.sqrt(np.var(f) / len(f))
+
+def calculate_integral(distribution, N=10000, f=identity, method='plain', proposal=None, strata=None,
+                       replicas=16, rng=None):
+    """Estimate the integral of f(x) * pdf(x), i.e. E[f(X)] for X ~ distribution,
+       from N evaluations of the vectorized integrand f. Returns (fBar, sigma).
+         plain:       samples from the distribution
+         importance:  samples from proposal (a frozen scipy distribution), weighted by pdf/proposal.pdf
+         stratified:  strata equal-probability strata (default N//10), N/strata samples in each
+         antithetic:  pairs ppf(u), ppf(1-u)
+         sobol/halton: scrambled quasi-random points through the ppf (Sobol rounds down to a
+                      power of 2 per replica); the error comes from the spread of replicas
+                      independent scramblings
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    match method:
+        case 'plain':
+            return mean_sigma(f(distribution.rvs(size=N, random_state=rng)))
+        case 'importance':
+            if proposal is None:
+                raise ValueError("importance sampling needs a proposal distribution")
+            y = proposal.rvs(size=N, random_state=rng)
+            return mean_sigma(f(y) * distribution.pdf(y) / proposal.pdf(y))
+        case 'stratified':
+            K = max(1, N // 10) if strata is None else strata
+            n = max(2, N // K)
+            u = (np.arange(K)[:, None] + rng.uniform(0, 1, (K, n))) / K
+            fk = f(distribution.ppf(u))
+            return np.mean(fk), np.sqrt(np.sum(np.var(fk, axis=1, ddof=1) / n)) / K
+        case 'antithetic':
+            u = rng.uniform(0, 1, N // 2)
+            return mean_sigma((f(distribution.ppf(u)) + f(distribution.ppf(1 - u))) / 2)
+        case 'sobol' | 'halton':
+            from scipy.stats import qmc
+            n = max(1, N // replicas)
+            means = []
+            for seed in rng.spawn(replicas):
+                if method == 'sobol':   # balanced only for powers of 2
+                    u = qmc.Sobol(d=1, seed=seed).random_base2(int(np.log2(n)))[:, 0]
+                else:
+                    u = qmc.Halton(d=1, seed=seed).random(n)[:, 0]
+                means.append(np.mean(f(distribution.ppf(u))))
+            return mean_sigma(np.array(means))
+        case _:
+            raise ValueError(f"unknown method {method!r}, expected one of {METHODS}")
+
+@lru_cache(maxsize=None)
+def examples():
+    """(name, distribution, integrand, importance sampling proposal); both integrals equal 2.
+       Built on first use, so importing this module does not load scipy.stats.
+    """
+    from scipy.stats import expon, gamma
+    return (
+        ("exponential", expon(), square, gamma(a=2.5)),
+        ("gamma", gamma(a=2), identity, gamma(a=2.5)),
+    )
+
+def compare(N=100000, repeats=5):
+    """Variance reduction per CPU-second of every method relative to plain sampling"""
+    print(f"{'example':>12} {'method':>11} {'fBar':>10} {'sigma':>10} {'cpu s':>8} {'gain':>8}")
+    for name, dist, f, proposal in examples():
+        base = None
+        for method in METHODS:
+            rng = np.random.default_rng(0)
+            t0 = time.process_time()
+            for _ in range(repeats):
+                fBar, sigma = calculate_integral(dist, N, f, method, proposal, rng=rng)
+            cpu = (time.process_time() - t0) / repeats
+            cost = sigma**2 * cpu   # inverse efficiency
+            base = cost if base is None else base
+            print(f"{name:>12} {method:>11} {fBar:10.6f} {sigma:10.2e} {cpu:8.4f} {base / cost:8.1f}")
+
+class MeanAccumulator:
+    """Running count, mean and sum of squared deviations (M2) of a stream of values.
+       Chunks are folded in with Chan et al.'s pairwise update, so accumulators from
+       different chunks or processes merge without loss of precision.
+    """
+    def __init__(self, n=0, mean=0.0, M2=0.0):
+        self.n = n
+        self.mean = mean
+        self.M2 = M2
+
+    def add(self, x):
+        m = np.mean(x)
+        self.merge(MeanAccumulator(len(x), m, np.sum((x - m)**2)))
 
-    exp_dist = expon() # Exponential distribution
-    fBar, sigma = calculate_integral(exp_dist, N)
-    print(f"Integral for exponential distribution is {fBar} +- {sigma}")
+    def merge(self, other):
+        n = self.n + other.n
+        if n == 0:
+            return
+        delta = other.mean - self.mean
+        self.mean += delta * other.n / n
+        self.M2 += other.M2 + delta**2 * self.n * other.n / n
+        self.n = n
 
-    gamma_dist = gamma(a=2) 
-    fBar, sigma = calculate_integral(gamma_dist, N)
-    print(f"Integral for gamma distribution is {fBar} +- {sigma}")
+    @property
+    def sigma(self):
+        """standard error of the mean"""
+        return np.sqrt(self.M2 / (self.n - 1) / self.n) if self.n > 1 else np.inf
+
+def integrate_chunks(distribution, f, nsamples, chunk, seed):
+    """nsamples samples, chunk at a time, from one seed stream (process pool worker)"""
+    rng = np.random.default_rng(seed)
+    acc = MeanAccumulator()
+    for start in range(0, nsamples, chunk):
+        acc.add(f(distribution.rvs(size=min(chunk, nsamples - start), random_state=rng)))
+    return acc
+
+def integrate_streaming(distribution, f=identity, chunk=100000, max_samples=10**10, abs_err=None, rel_err=None,
+                        seed=None, workers=1, chunks_per_task=10):
+    """Monte Carlo estimate of E[f(X)] in chunks of samples, in constant memory.
+       Stops once sigma <= abs_err or sigma <= rel_err*|mean| (checked after every round
+       of workers*chunks_per_task chunks) or after max_samples. Every task draws from
+       its own SeedSequence child. f must be picklable when workers > 1.
+       Returns (mean, sigma, number of samples).
+    """
+    root = np.random.SeedSequence(seed)
+    acc = MeanAccumulator()
+
+    def converged():
+        return (abs_err is not None and acc.sigma <= abs_err) or \
+               (rel_err is not None and acc.sigma <= rel_err * abs(acc.mean))
+
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        while acc.n < max_samples and not converged():
+            # the round's samples split as evenly as possible, so the total ends at max_samples
+            q, r = divmod(min(workers * chunks_per_task * chunk, max_samples - acc.n), workers)
+            nsamples = [n for n in [q + 1] * r + [q] * (workers - r) if n > 0]
+            ntasks = len(nsamples)
+            seeds = root.spawn(ntasks)
+            if pool is None:
+                results = [integrate_chunks(distribution, f, n, chunk, s) for n, s in zip(nsamples, seeds)]
+            else:
+                results = pool.map(integrate_chunks, [distribution]*ntasks, [f]*ntasks,
+                                   nsamples, [chunk]*ntasks, seeds)
+            for r in results:
+                acc.merge(r)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return acc.mean, acc.sigma, acc.n
+
+def main():
+    parser = argparse.ArgumentParser(description="Basic Monte Carlo integration")
+    parser.add_argument('--N', type=int, default=10000, help='Number of samples (maximum number when streaming)')
+    parser.add_argument('--stream', action='store_true', help='Chunked, constant-memory integration')
+    parser.add_argument('--chunk', type=int, default=100000, help='Samples per chunk')
+    parser.add_argument('--abs-err', type=float, default=None, help='Stop when the error is below this')
+    parser.add_argument('--rel-err', type=float, default=None, help='Stop when the relative error is below this')
+    parser.add_argument('--workers', type=int, default=1, help='Worker processes')
+    parser.add_argument('--seed', type=int, default=None, help='Root seed')
+    parser.add_argument('--method', choices=METHODS, default='plain', help='Estimator')
+    parser.add_argument('--compare', action='store_true', help='Compare the variance reduction of all estimators')
+    args = parser.parse_args()
+    N = args.N
+
+    if args.compare:
+        compare(N)
+        return
+    for name, dist, f, proposal in examples():
+        if args.stream:
+            fBar, sigma, n = integrate_streaming(dist, f, chunk=args.chunk, max_samples=N, abs_err=args.abs_err,
+                                                 rel_err=args.rel_err, seed=args.seed, workers=args.workers)
+            print(f"Integral for {name} distribution is {fBar} +- {sigma} ({n} samples)")
+        else:
+            rng = np.random.default_rng(args.seed)
+            fBar, sigma = calculate_integral(dist, N, f, args.method, proposal, rng=rng)
+            print(f"Integral for {name} distribution is {fBar} +- {sigma}")
 
 if __name__ == "__main__":
     main()
-
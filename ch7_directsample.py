@@ -2,74 +2,85 @@
 # 3 Examples of distributions
 
 import numpy as np
-import matplotlib.pyplot as plt
-
-# from scipy.special import theta
-from scipy.stats import expon, cauchy
 import argparse
-import sys
-
-def theta(x):
-    return np.heaviside(x, 0)
-
-parser = argparse.ArgumentParser(description="Plot different distributions.")
-parser.add_argument(
-    "-ex",
-    type=int,
-    choices=[1, 2, 3],
-    required=True,
-    help="Example number (1: Exponential, 2: Cauchy, 3: Triangular)",
-)
-args = parser.parse_args()
-EX = args.ex
+from ch7_histogram import Histogram
 
 Tau = 3.0
 N = 100000
 
-np.random.seed()
-u = np.random.uniform(0.0, 1.0, N) if EX != 3 else np.random.uniform(-1.0, 1.0, N)
-
-# Define the distributions and their sampling equations
-match EX:
-    case 1:
-        f = lambda x: (1 / Tau) * np.exp(-x / Tau)
-        S = lambda x: -Tau * np.log(1 - x)
-        title = "Exponential distribution"
-        minX = 0
-    case 2:
-        f = lambda x: 1 / (np.pi * (1 + x**2))
-        S = lambda x: np.tan(np.pi * (x - 0.5))
-        title = "Cauchy/Breit-Wigner distribution"
-        minX = -10
-    case _:
-        S30 = lambda x: np.sqrt(np.abs(4 * x)) - 2
-        f = lambda x: theta(2 - np.abs(x)) * (
-            theta(-x) * 0.25 * (2 + x) + theta(x) * 0.25 * (2 - x)
-        )
-        S = lambda x: theta(x) * S30(x) - theta(-x) * S30(-x)
-        title = "Triangular distribution"
-        minX = -10
-
-samples = S(u)  # Sample from the distribution
-
-hist, bins = np.histogram(samples, bins=100, range=(minX, 10), density=True)
-bin_centers = (bins[:-1] + bins[1:]) / 2
-
-plt.hist(
-    samples,
-    bins=100,
-    range=(minX, 10),
-    density=True,
-    alpha=0.75,
-    edgecolor="black",
-    label="Histogram",
-)
-x = np.linspace(minX, 10, 1000)
-plt.plot(x, f(x), "r-", linewidth=2, label="PDF")
-
-plt.title(title, fontsize=16, family="sans-serif")
-plt.xlabel("x", fontsize=16, family="sans-serif")
-plt.ylabel(r"$\rho(x)$", fontsize=16, family="sans-serif")
-plt.legend()
-
-plt.show()
+def exponential_pdf(x):
+    return (1 / Tau) * np.exp(-x / Tau)
+
+def exponential_S(u):
+    return -Tau * np.log(1 - u)
+
+def cauchy_pdf(x):
+    return 1 / (np.pi * (1 + x**2))
+
+def cauchy_S(u):
+    return np.tan(np.pi * (u - 0.5))
+
+def triangular_pdf(x):
+    return 0.25 * np.clip(2 - np.abs(x), 0, None)
+
+def triangular_S(u):
+    # u uniform on (-1, 1); one expression for both halves
+    return np.sign(u) * (np.sqrt(np.abs(4 * u)) - 2)
+
+# example -> (title, pdf, sampling equation, range of u, minX)
+EXAMPLES = {
+    1: ("Exponential distribution", exponential_pdf, exponential_S, (0.0, 1.0), 0),
+    2: ("Cauchy/Breit-Wigner distribution", cauchy_pdf, cauchy_S, (0.0, 1.0), -10),
+    3: ("Triangular distribution", triangular_pdf, triangular_S, (-1.0, 1.0), -10),
+}
+
+def sample(EX, n=N, rng=None):
+    """n samples of example EX by the transformation method"""
+    rng = np.random.default_rng() if rng is None else rng
+    title, f, S, (u0, u1), minX = EXAMPLES[EX]
+    return S(rng.uniform(u0, u1, n))
+
+def main():
+    parser = argparse.ArgumentParser(description="Plot different distributions.")
+    parser.add_argument(
+        "-ex",
+        type=int,
+        choices=[1, 2, 3],
+        required=True,
+        help="Example number (1: Exponential, 2: Cauchy, 3: Triangular)",
+    )
+    parser.add_argument("-headless", action="store_true", help="Print quartiles instead of plotting")
+    args = parser.parse_args()
+    EX = args.ex
+
+    title, f, S, urange, minX = EXAMPLES[EX]
+    samples = sample(EX)  # Sample from the distribution
+    if args.headless:
+        q1, q2, q3 = np.percentile(samples, [25, 50, 75])
+        print(f"{title}: {len(samples)} samples, quartiles {q1:.4f} {q2:.4f} {q3:.4f}")
+        return
+
+    import matplotlib.pyplot as plt
+    hist = Histogram(100, (minX, 10)).fill(samples)
+    edges = hist.edges[0]
+    plt.bar(
+        edges[:-1],
+        hist.density(),
+        width=np.diff(edges),
+        align="edge",
+        alpha=0.75,
+        edgecolor="black",
+        label="Histogram",
+    )
+    x = np.linspace(minX, 10, 1000)
+    plt.plot(x, f(x), "r-", linewidth=2, label="PDF")
+
+    plt.title(title, fontsize=16, family="sans-serif")
+    plt.xlabel("x", fontsize=16, family="sans-serif")
+    plt.ylabel(r"$\rho(x)$", fontsize=16, family="sans-serif")
+    plt.legend()
+
+    plt.show()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# Fixed-bin histogram accumulator: fed chunk by chunk, mergeable across processes and
+# savable to disk, so histograms of arbitrarily many samples take constant memory.
+
+import numpy as np
+
+class Histogram:
+    """Counts on a regular grid of bins over ranges, in any number of dimensions:
+       Histogram(100, (-2, 2)) or Histogram((25, 25), [(-1, 1), (0, 2*np.pi)]).
+       Bins are half-open [lo, hi) except the last, which also holds x == hi, as in
+       np.histogram; samples outside the ranges are counted in outside.
+    """
+    def __init__(self, bins, ranges):
+        self.bins = tuple(np.atleast_1d(bins).astype(int))
+        ranges = np.asarray(ranges, dtype=float).reshape(len(self.bins), 2)
+        self.lo = ranges[:, 0]
+        self.hi = ranges[:, 1]
+        self.counts = np.zeros(self.bins, dtype=np.int64)
+        self.outside = 0
+
+    @property
+    def edges(self):
+        return [np.linspace(a, b, n + 1) for a, b, n in zip(self.lo, self.hi, self.bins)]
+
+    @property
+    def total(self):
+        return int(self.counts.sum()) + self.outside
+
+    def fill(self, *coords):
+        """Add a chunk of samples, one array per dimension"""
+        inside = np.ones(len(coords[0]), dtype=bool)
+        index = []
+        for x, a, b, n in zip(coords, self.lo, self.hi, self.bins):
+            x = np.asarray(x, dtype=float)
+            ok = (x >= a) & (x <= b)    # false for nan, so only finite values are cast
+            i = np.zeros(len(x), dtype=np.int64)
+            # the clamp puts x == hi, and any x < hi rounded up to n, in the last bin
+            i[ok] = np.minimum(np.floor((x[ok] - a) * (n / (b - a))), n - 1)
+            inside &= ok
+            index.append(i)
+        flat = np.ravel_multi_index([i[inside] for i in index], self.bins)
+        self.counts += np.bincount(flat, minlength=self.counts.size).reshape(self.bins)
+        self.outside += len(inside) - int(np.count_nonzero(inside))
+        return self
+
+    def merge(self, other):
+        same = np.array_equal(self.lo, other.lo) and np.array_equal(self.hi, other.hi)
+        if self.bins != other.bins or not same:
+            raise ValueError("cannot merge histograms with different binning")
+        self.counts += other.counts
+        self.outside += other.outside
+        return self
+
+    def __iadd__(self, other):
+        return self.merge(other)
+
+    def density(self):
+        """counts normalised to unit integral over all samples, inside or not"""
+        volume = np.prod((self.hi - self.lo) / np.array(self.bins))
+        return self.counts / (max(self.total, 1) * volume)
+
+    def save(self, path):
+        np.savez(path, counts=self.counts, lo=self.lo, hi=self.hi, outside=self.outside)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        h = cls(data['counts'].shape, np.column_stack([data['lo'], data['hi']]))
+        h.counts += data['counts']
+        h.outside = int(data['outside'])
+        return h
@@ -1,39 +1,165 @@
+import time
+from functools import lru_cache
+from math import comb, factorial, pi
 import numpy as np
-import matplotlib.pyplot as plt
-from mpl_toolkits.mplot3d import Axes3D
+from numpy.polynomial import legendre, polynomial
 import argparse
+from mc_stats import autocorrelation_time
 
 class HydrogenAtomMarkovChain:
-    def __init__(self, n, l, m, sigma=1.0):
+    def __init__(self, n, l, m, sigma=1.0, seed=None):
         self.psi = Psi2Hydrogen(n, l, m)
-        self.engine = np.random.default_rng()
-        self.gauss = lambda: self.engine.normal(0, sigma)
+        self.engine = np.random.default_rng(seed)
+        self.sigma = sigma
+        self.accepted = 0
+        self.proposed = 0
 
     def move(self, v, prob=0.0):
-        v_prop = v + np.array([self.gauss(), self.gauss(), self.gauss()])
-        
-        r = np.zeros(3)
-        r[0] = np.linalg.norm(v_prop)
-        r[1] = v_prop[2] / r[0]
-        r[2] = np.arctan2(v_prop[1], v_prop[0])
-        
-        new_prob = self.psi(r)
+        v_prop = v + self.engine.normal(0, self.sigma, 3)
+        new_prob = self.psi(spherical(v_prop))
+        self.proposed += 1
         if new_prob > prob:
+            self.accepted += 1
             return v_prop, new_prob
         else:
             if self.engine.uniform(0, 1) < new_prob / prob:
+                self.accepted += 1
                 return v_prop, new_prob
             else:
                 return v, prob
 
+    def move_ensemble(self, V, prob):
+        """One Metropolis step for K independent walkers, V of shape (K, 3)"""
+        V_prop = V + self.engine.normal(0, self.sigma, V.shape)
+        new_prob = self.psi(spherical(V_prop))
+        accept = self.engine.uniform(0, 1, len(prob)) * prob < new_prob
+        self.proposed += len(prob)
+        self.accepted += np.count_nonzero(accept)
+        return np.where(accept[:, None], V_prop, V), np.where(accept, new_prob, prob)
+
+    @property
+    def acceptance(self):
+        return self.accepted / max(self.proposed, 1)
+
+    def burn_in(self, v, prob, steps, target=None, batch=50):
+        """Burn-in of a single chain, v of shape (3,), or an ensemble, v of shape (K, 3).
+           With a target acceptance rate, log(sigma) is adapted after every batch of
+           steps (Robbins-Monro); sigma is then frozen and the counters reset for production.
+        """
+        move = self.move_ensemble if np.ndim(v) == 2 else self.move
+        for k in range(-(-steps // batch)):
+            self.accepted = self.proposed = 0
+            for _ in range(min(batch, steps - k * batch)):
+                v, prob = move(v, prob)
+            if target is not None:
+                self.sigma *= np.exp((self.acceptance - target) / np.sqrt(1 + k))
+        self.accepted = self.proposed = 0
+        return v, prob
+
+    def sample_ensemble(self, npoints, walkers=10000, burn=100, target=None):
+        """npoints samples from walkers chains run in lockstep from the origin,
+           after burn steps of burn-in (tuning sigma toward target, if given)
+        """
+        V = np.zeros((walkers, 3))
+        prob = np.zeros(walkers)
+        V, prob = self.burn_in(V, prob, burn, target)
+        nsteps = -(-npoints // walkers)
+        points = np.empty((nsteps * walkers, 3))
+        for k in range(nsteps):
+            V, prob = self.move_ensemble(V, prob)
+            points[k*walkers:(k+1)*walkers] = V
+        return points[:npoints]
+
+    def diagnostics(self, points, walkers, seconds, max_chains=100):
+        """Acceptance rate, integrated autocorrelation time of r (in steps, averaged over
+           up to max_chains walkers) and effective independent samples per second
+        """
+        r = np.linalg.norm(points, axis=1)
+        nsteps = len(r) // walkers
+        chains = r[:nsteps * walkers].reshape(nsteps, walkers)[:, :max_chains]
+        tau_int = np.mean([autocorrelation_time(chains[:, k]) for k in range(chains.shape[1])])
+        ess = len(r) / (2 * tau_int)
+        print(f"sigma {self.sigma:.3f}, acceptance {self.acceptance:.3f}, tau_int {tau_int:.2f} steps, "
+              f"{ess:.0f} effective samples, {ess / seconds:.0f} effective samples/s")
+        return self.acceptance, tau_int, ess / seconds
+
+def spherical(v):
+    """(r, cos(theta), phi) of cartesian points v[..., 3], stacked along the first axis"""
+    r = np.linalg.norm(v, axis=-1)
+    cos_theta = np.divide(v[..., 2], r, out=np.zeros_like(r), where=r != 0)
+    return np.array([r, cos_theta, np.arctan2(v[..., 1], v[..., 0])])
+
+@lru_cache(maxsize=None)
+def hydrogen_coefficients(n, l, m):
+    """Power series coefficients of |psi_nlm|^2 = R(r)^2 |Y(theta)|^2 (atomic units):
+       R(r) = exp(-r/n) * poly_R(r), with the associated Laguerre polynomial and the
+       normalisation folded into poly_R, and |Y|^2 = (1 - x^2)^|m| * poly_Y(x)^2 with
+       x = cos(theta) and the m-th derivative of the Legendre polynomial in poly_Y.
+    """
+    if not (n >= 1 and 0 <= l < n and abs(m) <= l):
+        raise ValueError(f"invalid quantum numbers n={n}, l={l}, m={m}")
+    m = abs(m)
+    k, alpha = n - l - 1, 2 * l + 1
+    # L_k^alpha(x) = sum_i (-1)^i C(k+alpha, k-i) x^i / i!, evaluated at x = 2r/n
+    laguerre = np.array([(-1)**i * comb(k + alpha, k - i) / factorial(i) * (2 / n)**i for i in range(k + 1)])
+    norm_R = np.sqrt((2 / n)**3 * factorial(k) / (2 * n * factorial(n + l))) * (2 / n)**l
+    poly_R = norm_R * np.concatenate([np.zeros(l), laguerre])   # times r^l
+    poly_Y = polynomial.polyder(legendre.leg2poly([0] * l + [1]), m)
+    norm_Y = (2 * l + 1) / (4 * pi) * factorial(l - m) / factorial(l + m)
+    return poly_R, poly_Y * np.sqrt(norm_Y)
+
 class Psi2Hydrogen:
     def __init__(self, n, l, m):
         self.n = n
         self.l = l
         self.m = m
+        self.poly_R, self.poly_Y = hydrogen_coefficients(n, l, m)
+
+    def radial(self, r):
+        """R_nl(r)^2"""
+        return (np.exp(-r / self.n) * polynomial.polyval(r, self.poly_R))**2
+
+    def angular(self, x):
+        """|Y_lm|^2 as a function of x = cos(theta)"""
+        return (1 - x**2)**abs(self.m) * polynomial.polyval(x, self.poly_Y)**2
 
     def __call__(self, r):
-        return np.exp(-r[0]) * (r[0] ** self.l) * np.abs(np.sin(r[1]) ** self.m)
+        """|psi_nlm|^2 at r = (r, cos(theta), phi), vectorized over trailing axes"""
+        return self.radial(r[0]) * self.angular(r[1])
+
+@lru_cache(maxsize=None)
+def hydrogen_tables(n, l, m, npoints=4097):
+    """Tabulated inverse CDFs: (r grid, radial CDF, cos(theta) grid, angular CDF)"""
+    psi = Psi2Hydrogen(n, l, m)
+    r = np.linspace(0, 2 * n * (n + 15), npoints)   # the density is negligible beyond
+    x = np.linspace(-1, 1, npoints)
+    tables = []
+    for grid, pdf in ((r, r**2 * psi.radial(r)), (x, psi.angular(x))):
+        cdf = np.concatenate([[0], np.cumsum((pdf[1:] + pdf[:-1]) / 2 * np.diff(grid))])
+        tables += [grid, cdf / cdf[-1]]
+    return tuple(tables)
+
+class HydrogenDirectSampler:
+    """Independent samples of |psi_nlm|^2: r and cos(theta) from tabulated inverse CDFs
+       of the radial and angular densities, phi uniform. No burn-in, no autocorrelation.
+    """
+    def __init__(self, n, l, m, engine=None):
+        self.tables = hydrogen_tables(n, l, abs(m))
+        self.engine = np.random.default_rng() if engine is None else engine
+
+    def sample(self, npoints):
+        r_grid, r_cdf, x_grid, x_cdf = self.tables
+        r = np.interp(self.engine.uniform(0, 1, npoints), r_cdf, r_grid)
+        x = np.interp(self.engine.uniform(0, 1, npoints), x_cdf, x_grid)
+        phi = self.engine.uniform(0, 2 * pi, npoints)
+        rho = r * np.sqrt(1 - x**2)
+        return np.column_stack([rho * np.cos(phi), rho * np.sin(phi), r * x])
+
+def summary(points, n, l):
+    """Print the number of points and <r> against its exact value (3n^2 - l(l+1))/2"""
+    r = np.linalg.norm(points, axis=1)
+    print(f"{len(points)} points, <r> = {r.mean():.4f} +- {r.std() / np.sqrt(len(r)):.4f} "
+          f"(exact {(3 * n**2 - l * (l + 1)) / 2:.4f}, error bar ignores correlations)")
 
 def main():
     parser = argparse.ArgumentParser(description="Hydrogen atom Markov chain visualization")
@@ -42,6 +168,14 @@ def main():
     parser.add_argument('--L', type=int, default=0, help='Angular Momentum Quantum Number')
     parser.add_argument('--M', type=int, default=0, help='Magnetic Quantum Number')
     parser.add_argument('--fSigma', type=float, default=1.0, help='Under/over scale the proposal distribution')
+    parser.add_argument('--walkers', type=int, default=0, help='Run this many walkers as a vectorized ensemble')
+    parser.add_argument('--burn', type=int, default=100, help='Burn-in steps')
+    parser.add_argument('--target', type=float, default=None,
+                        help='Tune the proposal width during burn-in toward this acceptance rate')
+    parser.add_argument('--direct', action='store_true',
+                        help='Sample directly from the inverse CDFs instead of a Markov chain')
+    parser.add_argument('--headless', action='store_true',
+                        help='Print a summary of the points instead of plotting them')
     args = parser.parse_args()
 
     NPOINTS = args.NPOINTS
@@ -50,17 +184,32 @@ def main():
     M = args.M
     fSigma = args.fSigma
     
-    v = np.zeros(3)
-    rebound_collection = []
     chain = HydrogenAtomMarkovChain(N, L, M, fSigma * N)
-    prob = 0.0
+    t0 = time.perf_counter()
+    if args.direct:
+        rebound_collection = HydrogenDirectSampler(N, L, M).sample(NPOINTS)
+    elif args.walkers:
+        rebound_collection = chain.sample_ensemble(NPOINTS, args.walkers, args.burn, args.target)
+        chain.diagnostics(rebound_collection, args.walkers, time.perf_counter() - t0)
+    else:
+        v = np.zeros(3)
+        rebound_collection = []
+        prob = 0.0
+        v, prob = chain.burn_in(v, prob, args.burn, args.target)
 
-    for _ in range(NPOINTS):
-        rebound_collection.append(v)
-        v, prob = chain.move(v, prob)
-    
-    rebound_collection = np.array(rebound_collection)
-    
+        for _ in range(NPOINTS):
+            rebound_collection.append(v)
+            v, prob = chain.move(v, prob)
+
+        rebound_collection = np.array(rebound_collection)
+        chain.diagnostics(rebound_collection, 1, time.perf_counter() - t0)
+
+    if args.headless:
+        summary(rebound_collection, N, L)
+        return
+
+    import matplotlib.pyplot as plt
+    from mpl_toolkits.mplot3d import Axes3D
     fig = plt.figure()
     ax = fig.add_subplot(111, projection='3d')
     ax.scatter(rebound_collection[:, 0], rebound_collection[:, 1], rebound_collection[:, 2], c='k', marker='o')
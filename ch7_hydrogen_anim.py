@@ -1,39 +1,112 @@
+import queue
+import threading
 import numpy as np
-import pyvista as pv
 import argparse
+from ch7_hydrogen import HydrogenAtomMarkovChain, HydrogenDirectSampler, summary
 
-class HydrogenAtomMarkovChain:
-    def __init__(self, n, l, m, sigma=1.0):
-        self.psi = Psi2Hydrogen(n, l, m)
-        self.engine = np.random.default_rng()
-        self.gauss = lambda: self.engine.normal(0, sigma)
-
-    def move(self, v, prob=0.0):
-        v_prop = v + np.array([self.gauss(), self.gauss(), self.gauss()])
-
-        r = np.zeros(3)
-        r[0] = np.linalg.norm(v_prop)
-        r[1] = v_prop[2] / r[0] if r[0] != 0 else 0
-        r[2] = np.arctan2(v_prop[1], v_prop[0])
-
-        new_prob = self.psi(r)
-        if new_prob > prob:
-            return v_prop, new_prob
-        else:
-            if self.engine.uniform(0, 1) < new_prob / prob:
-                return v_prop, new_prob
-            else:
-                return v, prob
+def point_blocks(chain, args, block):
+    """Blocks of sampled points: block points at a time for the direct sampler and the
+       single chain, one step of all walkers for the ensemble. The chains start at the
+       origin and are burnt in (and tuned toward args.target) as in ch7_hydrogen.
+    """
+    if args.direct:
+        sampler = HydrogenDirectSampler(args.N, args.L, args.M)
+        for start in range(0, args.NPOINTS, block):
+            yield sampler.sample(min(block, args.NPOINTS - start))
+    elif args.walkers:
+        V, prob = chain.burn_in(np.zeros((args.walkers, 3)), np.zeros(args.walkers), args.burn, args.target)
+        for start in range(0, args.NPOINTS, args.walkers):
+            V, prob = chain.move_ensemble(V, prob)
+            yield V[:args.NPOINTS - start]
+    else:
+        v_state, v_prob = chain.burn_in(np.zeros(3), 0.0, args.burn, args.target)
+        for start in range(0, args.NPOINTS, block):
+            points = np.empty((min(block, args.NPOINTS - start), 3))
+            for k in range(len(points)):
+                v_state, v_prob = chain.move(v_state, v_prob)
+                points[k] = v_state
+            yield points
+
+def produce(blocks, out, stop):
+    """Producer thread: feed blocks to the queue, then None when done or the exception
+       that ended it. Every put waits in short timeouts, giving up once stop is set, so
+       the thread ends even when the consumer has stopped reading a full queue.
+    """
+    def put(item):
+        while not stop.is_set():
+            try:
+                out.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    end = None
+    try:
+        for b in blocks:
+            if not put(b):
+                break
+    except Exception as e:
+        end = e
+    finally:
+        put(end)
+
+class ProgressiveCloud:
+    """Point buffer preallocated for the whole run; the mesh shows at most budget points,
+       an evenly strided subsample once the cloud is larger
+    """
+    def __init__(self, plotter, capacity, budget):
+        import pyvista as pv
+        self.buffer = np.empty((capacity, 3), dtype=np.float32)
+        self.n = 0
+        self.budget = budget
+        self.mesh = pv.PolyData(np.zeros((1, 3), dtype=np.float32))
+        plotter.add_mesh(self.mesh, color="red", point_size=5.0, render_points_as_spheres=True)
 
-class Psi2Hydrogen:
-    def __init__(self, n, l, m):
-        self.n = n
-        self.l = l
-        self.m = m
+    def add(self, block):
+        self.buffer[self.n:self.n + len(block)] = block
+        self.n += len(block)
 
-    def __call__(self, r):
-        # Simplified model for hydrogen wavefunction
-        return np.exp(-r[0]) * (r[0] ** self.l) * np.abs(np.sin(r[1]) ** self.m)
+    def refresh(self):
+        if self.n:
+            import pyvista as pv
+            stride = -(-self.n // self.budget)
+            self.mesh.copy_from(pv.PolyData(self.buffer[:self.n:stride]))
+
+def stream(plotter, cloud, blocks, shots=None, shot_every=10):
+    """Consume blocks from a background producer, redrawing after each batch of arrivals;
+       an exception raised while producing is re-raised here. Off-screen, every
+       shot_every redraws (and the final one) are saved as <shots>_<k>.png; on screen
+       the window is updated interactively.
+    """
+    out = queue.Queue(maxsize=16)
+    stop = threading.Event()
+    worker = threading.Thread(target=produce, args=(blocks, out, stop), daemon=True)
+    worker.start()
+    k = 0
+    done = False
+    try:
+        while not done:
+            b = out.get()
+            while b is not None and not isinstance(b, Exception):
+                cloud.add(b)
+                try:
+                    b = out.get_nowait()
+                except queue.Empty:
+                    break
+            if isinstance(b, Exception):
+                raise b
+            done = b is None
+            cloud.refresh()
+            if shots is not None:
+                if done or k % shot_every == 0:
+                    plotter.screenshot(f"{shots}_{k:04d}.png")
+            else:
+                plotter.update()
+            k += 1
+    finally:
+        stop.set()
+        worker.join()
 
 def main():
     parser = argparse.ArgumentParser(description="Hydrogen atom Markov chain visualization")
@@ -42,6 +115,21 @@ def main():
     parser.add_argument('--L', type=int, default=0, help='Angular Momentum Quantum Number')
     parser.add_argument('--M', type=int, default=0, help='Magnetic Quantum Number')
     parser.add_argument('--fSigma', type=float, default=1.0, help='Under/over scale the proposal distribution')
+    parser.add_argument('--walkers', type=int, default=0, help='Run this many walkers as a vectorized ensemble')
+    parser.add_argument('--burn', type=int, default=100, help='Burn-in steps')
+    parser.add_argument('--target', type=float, default=None,
+                        help='Tune the proposal width during burn-in toward this acceptance rate')
+    parser.add_argument('--direct', action='store_true',
+                        help='Sample directly from the inverse CDFs instead of a Markov chain')
+    parser.add_argument('--stream', action='store_true',
+                        help='Sample in a background thread and draw the cloud as it grows')
+    parser.add_argument('--block', type=int, default=10000, help='Points per streamed block')
+    parser.add_argument('--budget', type=int, default=200000,
+                        help='Maximum number of points drawn; larger clouds are decimated')
+    parser.add_argument('--shots', default=None,
+                        help='Render off-screen, saving periodic screenshots as <shots>_<k>.png')
+    parser.add_argument('--shot-every', type=int, default=10, help='Redraws between screenshots')
+    parser.add_argument('--headless', action='store_true', help='Sample and print a summary, without pyvista')
     args = parser.parse_args()
 
     NPOINTS = args.NPOINTS
@@ -50,17 +138,28 @@ def main():
     M = args.M
     fSigma = args.fSigma
 
-    v_state = np.array([30.0, 0.0, 0.0])
-    v_prob = 0.0
-
     chain = HydrogenAtomMarkovChain(N, L, M, fSigma * N)
 
-    points = []
-    for _ in range(NPOINTS):
-        v_state, v_prob = chain.move(v_state, v_prob)
-        points.append(v_state)
+    if args.headless:
+        summary(np.concatenate(list(point_blocks(chain, args, args.block))), N, L)
+        return
+
+    import pyvista as pv
+    if args.stream:
+        plotter = pv.Plotter(off_screen=args.shots is not None)
+        cloud = ProgressiveCloud(plotter, NPOINTS, args.budget)
+        plotter.add_mesh(pv.Cube(center=(0, 0, 0), x_length=30, y_length=30, z_length=30),
+                         color="blue", style='wireframe')
+        plotter.show_grid()
+        if args.shots is None:
+            plotter.show(interactive_update=True)
+        stream(plotter, cloud, point_blocks(chain, args, args.block), args.shots, args.shot_every)
+        if args.shots is None:
+            plotter.iren.start()
+        plotter.close()
+        return
 
-    points = np.array(points)
+    points = np.concatenate(list(point_blocks(chain, args, args.block)))
 
     # Visualization using pyvista
     cloud = pv.PolyData(points)
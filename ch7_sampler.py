@@ -0,0 +1,211 @@
+# Fast samplers for arbitrary distributions: tabulated inverse CDF and Walker alias tables,
+# built once per sampler (kept on the instance) to draw batches at O(1) cost per sample, and rejection sampling
+# under an adaptively refined envelope.
+
+import time
+import argparse
+import numpy as np
+
+def inverse_cdf_table(pdf, lo, hi, npoints=4097, ntable=4097):
+    """x at ntable equally spaced values of the CDF of pdf on [lo, hi]. The CDF is
+       integrated (trapezoid rule) on npoints grid points and inverted by interpolation.
+    """
+    x = np.linspace(lo, hi, npoints)
+    p = pdf(x)
+    cdf = np.concatenate([[0], np.cumsum((p[1:] + p[:-1]) / 2 * np.diff(x))])
+    cdf /= cdf[-1]
+    return np.interp(np.linspace(0, 1, ntable), cdf, x)
+
+class InverseCDFSampler:
+    """Samples a vectorized pdf on [lo, hi] by linear interpolation in a table of the
+       inverse CDF sampled at equally spaced CDF values, so lookup is O(1) per sample.
+    """
+    def __init__(self, pdf, lo, hi, npoints=4097, ntable=4097, rng=None):
+        self.table = inverse_cdf_table(pdf, lo, hi, npoints, ntable)
+        self.rng = np.random.default_rng() if rng is None else rng
+
+    def sample(self, n):
+        t = self.rng.uniform(0, 1, n) * (len(self.table) - 1)
+        k = np.minimum(t.astype(np.int64), len(self.table) - 2)
+        return self.table[k] + (t - k) * (self.table[k+1] - self.table[k])
+
+class AliasSampler:
+    """Walker's alias method for a discrete distribution: values[k] with probability
+       proportional to weights[k]. One uniform picks a column, a second decides between
+       the column and its alias.
+    """
+    def __init__(self, weights, values=None, rng=None):
+        w = np.asarray(weights, dtype=float)
+        n = len(w)
+        self.values = np.arange(n) if values is None else np.asarray(values)
+        self.rng = np.random.default_rng() if rng is None else rng
+        self.prob, self.alias = alias_table(w * n / w.sum())
+
+    def indices(self, n):
+        k = self.rng.integers(0, len(self.prob), n)
+        return np.where(self.rng.uniform(0, 1, n) < self.prob[k], k, self.alias[k])
+
+    def sample(self, n):
+        return self.values[self.indices(n)]
+
+    @classmethod
+    def from_pdf(cls, pdf, edges, rng=None):
+        """Binned continuous distribution: a bin from the alias table, uniform within it"""
+        edges = np.asarray(edges, dtype=float)
+        centres = (edges[1:] + edges[:-1]) / 2
+        sampler = cls(pdf(centres) * np.diff(edges), rng=rng)
+        sampler.edges = edges
+        return sampler
+
+    def sample_binned(self, n):
+        k = self.indices(n)
+        return self.edges[k] + self.rng.uniform(0, 1, n) * (self.edges[k+1] - self.edges[k])
+
+def alias_table(scaled):
+    """Vose's O(n) construction from an array of probabilities scaled to mean 1"""
+    scaled = np.asarray(scaled, dtype=float)
+    prob = scaled.tolist()      # python floats: the loop does scalar work only
+    alias = list(range(len(prob)))
+    small = np.flatnonzero(scaled < 1).tolist()
+    large = np.flatnonzero(scaled >= 1).tolist()
+    while small and large:
+        s, l = small.pop(), large.pop()
+        alias[s] = l
+        prob[l] -= 1 - prob[s]
+        (small if prob[l] < 1 else large).append(l)
+    for k in small + large:     # leftovers are 1 up to rounding
+        prob[k] = 1.0
+    return np.array(prob), np.array(alias)
+
+def rejection_sample(pdf, lo, hi, fmax, n, rng=None):
+    """n samples by throwing points under the flat ceiling fmax"""
+    rng = np.random.default_rng() if rng is None else rng
+    out = []
+    got = 0
+    while got < n:
+        x = rng.uniform(lo, hi, 2 * (n - got))
+        x = x[rng.uniform(0, fmax, len(x)) < pdf(x)]
+        out.append(x)
+        got += len(x)
+    return np.concatenate(out)[:n]
+
+class EnvelopeRejectionSampler:
+    """Rejection sampling of a vectorized density f(x1, ..., xd) on the box [lo, hi]
+       under a piecewise-constant envelope. Each cell's height is the largest value of f
+       on a (probes+1)^d grid in the cell, raised by margin. After every batch the cells
+       wasting the most proposals are split in two along their widest side, up to
+       max_cells, which tightens the envelope where the rejections happen. A proposal
+       above its cell's height raises that height and the batch is redrawn.
+    """
+    def __init__(self, f, lo, hi, bins=8, probes=4, margin=0.05, max_cells=4096, rng=None):
+        self.f = f
+        self.lo = np.atleast_1d(np.asarray(lo, dtype=float))
+        self.hi = np.atleast_1d(np.asarray(hi, dtype=float))
+        self.d = len(self.lo)
+        self.probes = probes
+        self.margin = margin
+        self.max_cells = max_cells
+        self.rng = np.random.default_rng() if rng is None else rng
+        self.proposed = 0
+        self.accepted = 0
+
+        edges = [np.linspace(a, b, bins + 1) for a, b in zip(self.lo, self.hi)]
+        corners = np.stack(np.meshgrid(*[e[:-1] for e in edges], indexing='ij'), axis=-1).reshape(-1, self.d)
+        self.cell_lo = corners
+        self.cell_hi = corners + (self.hi - self.lo) / bins
+        self.height = self.bound(self.cell_lo, self.cell_hi)
+
+    def bound(self, lo, hi):
+        """envelope heights of the cells [lo, hi]"""
+        grid = np.meshgrid(*[np.linspace(0, 1, self.probes + 1)] * self.d, indexing='ij')
+        t = np.stack(grid, axis=-1).reshape(-1, self.d)
+        x = lo[:, None, :] + t[None, :, :] * (hi - lo)[:, None, :]
+        fx = self.f(*np.moveaxis(x, -1, 0))
+        return fx.max(axis=1) * (1 + self.margin)
+
+    @property
+    def acceptance(self):
+        return self.accepted / max(self.proposed, 1)
+
+    def sample(self, n, max_batch=10**6):
+        """exactly n accepted samples, shape (n,) in one dimension, (n, d) otherwise"""
+        out = np.empty((n, self.d))
+        got = 0
+        while got < n:
+            rate = self.acceptance if self.proposed else 0.5
+            # batches grow geometrically so the envelope is refined early on
+            size = min(max_batch, max(1024, self.proposed), int((n - got) / max(rate, 1e-3) * 1.1) + 16)
+            weights = self.height * np.prod(self.cell_hi - self.cell_lo, axis=1)
+            k = self.rng.choice(len(weights), size, p=weights / weights.sum())
+            x = self.cell_lo[k] + self.rng.uniform(0, 1, (size, self.d)) * (self.cell_hi[k] - self.cell_lo[k])
+            fx = self.f(*x.T)
+            self.proposed += size
+            over = fx > self.height[k]
+            if over.any():
+                np.maximum.at(self.height, k[over], fx[over] * (1 + self.margin))
+                continue
+            accept = self.rng.uniform(0, 1, size) * self.height[k] < fx
+            x = x[accept][:n - got]
+            out[got:got + len(x)] = x
+            got += len(x)
+            self.accepted += np.count_nonzero(accept)
+            self.refine(k, accept)
+        return out[:, 0] if self.d == 1 else out
+
+    def refine(self, k, accept):
+        """split the cells with above-average numbers of rejections"""
+        room = self.max_cells - len(self.height)
+        if room <= 0:
+            return
+        rejected = np.bincount(k[~accept], minlength=len(self.height))
+        split = np.argsort(rejected)[::-1][:room]
+        split = split[rejected[split] > rejected.mean()]
+        if len(split) == 0:
+            return
+        lo, hi = self.cell_lo[split], self.cell_hi[split]
+        widths = (hi - lo) / (self.hi - self.lo)
+        axis = np.argmax(widths, axis=1)
+        mid = (lo[np.arange(len(split)), axis] + hi[np.arange(len(split)), axis]) / 2
+        hi_left, lo_right = hi.copy(), lo.copy()
+        hi_left[np.arange(len(split)), axis] = mid
+        lo_right[np.arange(len(split)), axis] = mid
+        keep = np.ones(len(self.height), dtype=bool)
+        keep[split] = False
+        self.cell_lo = np.concatenate([self.cell_lo[keep], lo, lo_right])
+        self.cell_hi = np.concatenate([self.cell_hi[keep], hi_left, hi])
+        self.height = np.concatenate([self.height[keep], self.bound(lo, hi_left), self.bound(lo_right, hi)])
+
+def benchmark(n=10**6, repeats=5):
+    """Samples per second of the closed-form transforms of ch7_directsample against the
+       tabulated inverse CDF, the binned alias table and rejection sampling
+    """
+    from ch7_directsample import EXAMPLES, sample
+    ranges = {1: (0.0, 60.0), 2: (-50.0, 50.0), 3: (-2.0, 2.0)}
+    rng = np.random.default_rng(0)
+    print(f"{'distribution':>34} {'method':>12} {'Msamples/s':>11} {'mean':>9}")
+    for EX, (title, pdf, S, urange, minX) in EXAMPLES.items():
+        lo, hi = ranges[EX]
+        fmax = pdf(np.linspace(lo, hi, 10001)).max()
+        table = InverseCDFSampler(pdf, lo, hi, rng=rng)
+        alias = AliasSampler.from_pdf(pdf, np.linspace(lo, hi, 4097), rng=rng)
+        methods = [
+            ("closed form", lambda: sample(EX, n, rng)),
+            ("inverse CDF", lambda: table.sample(n)),
+            ("alias", lambda: alias.sample_binned(n)),
+            ("rejection", lambda: rejection_sample(pdf, lo, hi, fmax, n, rng)),
+        ]
+        for name, draw in methods:
+            t0 = time.perf_counter()
+            for _ in range(repeats):
+                x = draw()
+            rate = n * repeats / (time.perf_counter() - t0)
+            # the Cauchy mean does not exist; show the median there
+            centre = np.median(x) if EX == 2 else np.mean(x)
+            print(f"{title:>34} {name:>12} {rate / 1e6:11.1f} {centre:9.4f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the fast samplers against direct and rejection sampling.")
+    parser.add_argument("-n", type=int, default=10**6, help="Samples per draw")
+    args = parser.parse_args()
+    benchmark(args.n)
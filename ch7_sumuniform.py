@@ -1,26 +1,56 @@
+import os
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
-import matplotlib.pyplot as plt
+from ch7_histogram import Histogram
+
+NUM_BINS = 1000
+X_RANGE = (-10, 10)
+
+def fill_histograms(num_samples, seed, chunk=1000000):
+    """Histograms of the sums of 1..4 uniform variates, chunk samples at a time (worker)"""
+    rng = np.random.default_rng(seed)
+    hists = [Histogram(NUM_BINS, X_RANGE) for _ in range(4)]
+    for start in range(0, num_samples, chunk):
+        sums = np.cumsum(rng.uniform(-1.0, 1.0, (min(chunk, num_samples - start), 4)), axis=1)
+        for i, h in enumerate(hists):
+            h.fill(sums[:, i])
+    return hists
+
+def create_histograms(num_samples=1000000, workers=1, seed=None, out=None):
+    """Split the samples over workers processes with independent seeds and merge"""
+    seeds = np.random.SeedSequence(seed).spawn(workers)
+    counts = [num_samples // workers + (k < num_samples % workers) for k in range(workers)]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(fill_histograms, counts, seeds))
+    else:
+        parts = [fill_histograms(counts[0], seeds[0])]
+    hists = parts[0]
+    for part in parts[1:]:
+        for h, p in zip(hists, part):
+            h += p
+    if out is not None:
+        for i, h in enumerate(hists):
+            h.save(f"{out}_{i+1}.npz")
 
-def create_histograms():
-    num_samples = 1000000
-    num_bins = 1000
-    x_range = (-10, 10)
-    uniform_samples = np.random.uniform(-1.0, 1.0, (num_samples, 4))
-    
-    histograms = []
     titles = ["One uniform variate", "Two uniform variates", "Three uniform variates", "Four uniform variates"]
-    for i in range(4):
-        samples_sum = np.cumsum(uniform_samples[:, :i+1], axis=1)[:, -1]
-        hist, bins = np.histogram(samples_sum, bins=num_bins, range=x_range)
-        histograms.append((hist, bins, titles[i]))
-    
-    return histograms
+    return [(h.counts, h.edges[0], title) for h, title in zip(hists, titles)]
+
+def print_moments(histograms):
+    """Mean and variance from the binned counts; the sum of k variates has variance k/3"""
+    for k, (hist, bins, title) in enumerate(histograms, start=1):
+        centres = (bins[:-1] + bins[1:]) / 2
+        mean = hist @ centres / hist.sum()
+        var = hist @ (centres - mean)**2 / hist.sum()
+        print(f"{title}: {hist.sum()} samples, mean {mean:.4f}, variance {var:.4f} (exact {k / 3:.4f})")
 
 class InteractivePlot:
     def __init__(self, histograms):
         self.histograms = histograms
         self.current_view = 0
-        
+
+        import matplotlib.pyplot as plt
         self.figure, self.ax = plt.subplots()
         print("Press 'n' to shift to next plot")
         self.figure.canvas.mpl_connect('key_press_event', self.on_key_press)
@@ -34,7 +64,7 @@ class InteractivePlot:
         bin_centers = (bins[:-1] + bins[1:]) / 2
         
         self.ax.bar(bin_centers, hist, width=(bins[1] - bins[0]), edgecolor='black')
-        self.ax.set_ylim(0, 12000)
+        self.ax.set_ylim(0, 0.012 * self.histograms[0][0].sum())
         self.ax.set_title(title, fontsize=16, family='sans-serif')
         self.ax.set_xlabel('x', fontsize=16, family='sans-serif')
         self.ax.set_ylabel('counts', fontsize=16, family='sans-serif')
@@ -47,6 +77,16 @@ class InteractivePlot:
             self.show_histogram(self.current_view)
 
 if __name__ == "__main__":
-    histograms = create_histograms()
-    InteractivePlot(histograms)
+    parser = argparse.ArgumentParser(description="Histograms of sums of uniform variates")
+    parser.add_argument('-N', type=int, default=1000000, help='Number of samples')
+    parser.add_argument('-workers', type=int, default=os.cpu_count(), help='Worker processes')
+    parser.add_argument('-seed', type=int, default=None, help='Root seed')
+    parser.add_argument('-out', default=None, help='Save the histograms as <out>_<k>.npz')
+    parser.add_argument('-headless', action='store_true', help='Print the moments instead of plotting')
+    args = parser.parse_args()
+    histograms = create_histograms(args.N, args.workers, args.seed, args.out)
+    if args.headless:
+        print_moments(histograms)
+    else:
+        InteractivePlot(histograms)
 
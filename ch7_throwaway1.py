@@ -1,18 +1,40 @@
+import argparse
 import numpy as np
-import matplotlib.pyplot as plt
+from ch7_sampler import EnvelopeRejectionSampler
+from ch7_histogram import Histogram
 
 def f(x):
     return 3/4 * (1 - x**2)
 
-np.random.seed(100)
-rx = np.random.uniform(-1, 1, 1000000)
-ry = np.random.uniform(0, 0.75, 1000000)
-hx = rx[ry < f(rx)]
+def main():
+    parser = argparse.ArgumentParser(description="Rejection sampling of 3/4 (1 - x^2)")
+    parser.add_argument('-N', type=int, default=1000000, help='Number of points thrown (accepted with -adaptive)')
+    parser.add_argument('-adaptive', action='store_true', help='Adaptive envelope, exactly N accepted samples')
+    parser.add_argument('-headless', action='store_true', help='Only print the acceptance rate')
+    args = parser.parse_args()
 
-plt.hist(hx, bins=100, range=(-2.0, 2.0), density=True, alpha=0.75, edgecolor='black')
-plt.title('Histogram of X', fontsize=16, family='sans-serif')
-plt.xlabel('x', fontsize=16, family='sans-serif')
-plt.ylabel(r'$\rho(x)$', fontsize=16, family='sans-serif')
-plt.grid(False)
-plt.show()
+    if args.adaptive:
+        sampler = EnvelopeRejectionSampler(f, -1, 1, rng=np.random.default_rng(100))
+        hx = sampler.sample(args.N)
+        print(f"accepted {len(hx)}, acceptance rate {sampler.acceptance:.3f}")
+    else:
+        rng = np.random.default_rng(100)
+        rx = rng.uniform(-1, 1, args.N)
+        ry = rng.uniform(0, 0.75, args.N)
+        hx = rx[ry < f(rx)]
+        print(f"accepted {len(hx)}, acceptance rate {len(hx) / args.N:.3f}")
+    if args.headless:
+        return
 
+    import matplotlib.pyplot as plt
+    hist = Histogram(100, (-2.0, 2.0)).fill(hx)
+    edges = hist.edges[0]
+    plt.bar(edges[:-1], hist.density(), width=np.diff(edges), align='edge', alpha=0.75, edgecolor='black')
+    plt.title('Histogram of X', fontsize=16, family='sans-serif')
+    plt.xlabel('x', fontsize=16, family='sans-serif')
+    plt.ylabel(r'$\rho(x)$', fontsize=16, family='sans-serif')
+    plt.grid(False)
+    plt.show()
+
+if __name__ == "__main__":
+    main()
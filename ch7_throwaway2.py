@@ -1,36 +1,59 @@
+import argparse
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.colors import LogNorm
+from ch7_sampler import EnvelopeRejectionSampler
+from ch7_histogram import Histogram
 
 def f(x, phi):
     return 1 / (2 - x) + (2 - x) - 2.0 * (1 - x**2) * (np.cos(phi)**2)
 
-MAXTHROW = 2.0
-num_samples = 1000000
-
-# Random sample generation
-np.random.seed(100)
-rx = np.random.uniform(-1.0, 1.0, num_samples)
-rphi = np.random.uniform(0.0, 2 * np.pi, num_samples)
-ry = np.random.uniform(0.0, MAXTHROW, num_samples)
-
-valid_indices = ry < f(rx, rphi)
-filtered_rx = rx[valid_indices]
-filtered_rphi = rphi[valid_indices]
-
-hist, xedges, yedges = np.histogram2d(filtered_rx, filtered_rphi, bins=[25, 25], range=[[-1.0, 1.0], [0, 2 * np.pi]])
-
-fig, ax = plt.subplots()
-X, Y = np.meshgrid(xedges, yedges)
-pcm = ax.pcolormesh(X, Y, hist.T, norm=LogNorm(), cmap='Greys', edgecolor='black', linewidth=0.5)
-
-ax.set_xlabel(r'$x = \cos(\theta)$', fontsize=16, family='sans-serif')
-ax.set_ylabel(r'$\phi$', fontsize=16, family='sans-serif')
-ax.set_title('X vs PHI', fontsize=16, family='sans-serif')
-
-ax.set_aspect('auto')
-plt.colorbar(pcm, ax=ax, extend='max')
-plt.grid(False)
-
-plt.show()
-
+MAXTHROW = 2.0 # f reaches 10/3 at x = -1, so this flat ceiling clips the density there
+
+def main():
+    parser = argparse.ArgumentParser(description="Rejection sampling of (x, phi)")
+    parser.add_argument('-N', type=int, default=1000000, help='Number of points thrown (accepted with -adaptive)')
+    parser.add_argument('-adaptive', action='store_true', help='Adaptive envelope, exactly N accepted samples')
+    parser.add_argument('-headless', action='store_true', help='Only print the acceptance rate')
+    args = parser.parse_args()
+    num_samples = args.N
+
+    if args.adaptive:
+        sampler = EnvelopeRejectionSampler(f, [-1.0, 0.0], [1.0, 2 * np.pi], rng=np.random.default_rng(100))
+        filtered_rx, filtered_rphi = sampler.sample(num_samples).T
+        print(f"accepted {len(filtered_rx)}, acceptance rate {sampler.acceptance:.3f}")
+    else:
+        # Random sample generation
+        rng = np.random.default_rng(100)
+        rx = rng.uniform(-1.0, 1.0, num_samples)
+        rphi = rng.uniform(0.0, 2 * np.pi, num_samples)
+        ry = rng.uniform(0.0, MAXTHROW, num_samples)
+
+        valid_indices = ry < f(rx, rphi)
+        filtered_rx = rx[valid_indices]
+        filtered_rphi = rphi[valid_indices]
+        print(f"accepted {len(filtered_rx)}, acceptance rate {len(filtered_rx) / num_samples:.3f}")
+
+    if args.headless:
+        return
+
+    hist = Histogram((25, 25), [(-1.0, 1.0), (0, 2 * np.pi)]).fill(filtered_rx, filtered_rphi)
+    xedges, yedges = hist.edges
+
+    import matplotlib.pyplot as plt
+    from matplotlib.colors import LogNorm
+
+    fig, ax = plt.subplots()
+    X, Y = np.meshgrid(xedges, yedges)
+    pcm = ax.pcolormesh(X, Y, hist.counts.T, norm=LogNorm(), cmap='Greys', edgecolor='black', linewidth=0.5)
+
+    ax.set_xlabel(r'$x = \cos(\theta)$', fontsize=16, family='sans-serif')
+    ax.set_ylabel(r'$\phi$', fontsize=16, family='sans-serif')
+    ax.set_title('X vs PHI', fontsize=16, family='sans-serif')
+
+    ax.set_aspect('auto')
+    plt.colorbar(pcm, ax=ax, extend='max')
+    plt.grid(False)
+
+    plt.show()
+
+if __name__ == "__main__":
+    main()
@@ -1,82 +1,324 @@
 # A simulation of a percolating system.
+# scipy and matplotlib are imported where they are used, so the kernels import with
+# numpy alone and only the display paths pay for the plotting libraries.
 
 import numpy as np
-from typing import Generator, Tuple, Any    
-import matplotlib.pyplot as plt
-import matplotlib.colors as mcolors
-from itertools import product
+from typing import Tuple, Any
+from typing import Callable, Iterable, Optional
+import os
 import sys
+import itertools
 import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-def neighbours(grid: np.typing.NDArray[Any], xy: (int,int)) -> Generator[Tuple[int, int], None, None]:
-    """ neghbours: left-right, up-down  """
-    N1, N2 = grid.shape
-    g=((di, dj) for (di,dj) in product([-1, 0, 1], repeat=2))
-    g=((di,dj) for (di,dj) in g if (di!=0 or dj!=0) and (di==0 or dj==0)) # left-right or up-down
-    g=((xy[0]+di,xy[1]+dj) for (di,dj) in g)
-    g=((ni,nj) for (ni,nj) in g if 0<=ni<N1 and 0<=nj<N2)
-    g=(xy for xy in g if grid[xy]!=0) # occupied neighbours
-    yield from g
-
-def percolates(cluster: set, grid_size: int) -> bool:
-    """spans the grid top to bottom"""
-    return min([xy[0] for xy in cluster]) == 0 and \
-           max([xy[0] for xy in cluster]) == grid_size-1
-
-def cluster_index(clusters: list, xy: int) -> int:
-    """index of cluster xy belongs to"""
-    for i, cluster in enumerate(clusters):
-        if xy in cluster:
-            return i
-    return -1
-
-def percolation_sim(N: int = 20, P: float = 0.6) -> (np.typing.NDArray[Any], list):
-    grid = np.random.binomial(1, P, (N, N)) # Generate the configuration
-    clusters = []
-    for i, j in ((i,j) for (i,j) in  product(range(N), range(N)) if grid[i,j]>0):
-        p0 = (i, j)
-        i0 = cluster_index(clusters, p0)
-        for p1 in neighbours(grid, p0):
-            i1 = cluster_index(clusters, p1)
-            if i0 == -1 and i1 == -1:
-                clusters += [ set([p0,p1]) ]
-                i0 = cluster_index(clusters, p0)
-            elif i0 != i1 and i0 == -1:
-                clusters[i1].add(p0)
-            elif i0 != i1 and i1 == -1:
-                clusters[i0].add(p1)
-            elif i0 != i1:
-                clusters[i0].update(clusters[i1]) 
-                del clusters[i1]
-                i0 = cluster_index(clusters, p0)
-
-    return grid, clusters
-
-def perc01():
-    """Visualise percolation on square lattice
+def label_clusters(grid: np.typing.NDArray[Any]
+                   ) -> Tuple[np.typing.NDArray[Any], np.typing.NDArray[Any], np.typing.NDArray[Any]]:
+    """Label the nearest-neighbour (left-right, up-down) clusters with scipy.ndimage.label;
+       every occupied site belongs to a cluster, isolated sites being clusters of size 1.
+       Returns labels (0: empty, 1..n: cluster), sizes[k] and spans[k] = (rmin, rmax, cmin, cmax)
+       of cluster k; index 0 of sizes/spans is unused.
+    """
+    from scipy import ndimage
+    labels, n = ndimage.label(grid)
+    sizes = np.bincount(labels.ravel(), minlength=n+1)
+    sizes[0] = 0
+    spans = np.zeros((n+1, 4), dtype=int)
+    for k, (rows, cols) in enumerate(ndimage.find_objects(labels), start=1):
+        spans[k] = rows.start, rows.stop-1, cols.start, cols.stop-1
+    return labels, sizes, spans
+
+def percolates(labels: np.typing.NDArray[Any]) -> np.typing.NDArray[Any]:
+    """labels of the clusters that span the grid top to bottom"""
+    spanning = np.intersect1d(labels[0], labels[-1])
+    return spanning[spanning > 0]
+
+def percolation_sim(N: int = 20, P: float = 0.6, rng: np.random.Generator = None
+                    ) -> Tuple[np.typing.NDArray[Any], np.typing.NDArray[Any],
+                               np.typing.NDArray[Any], np.typing.NDArray[Any]]:
+    rng = np.random.default_rng() if rng is None else rng
+    grid = rng.binomial(1, P, (N, N)) # Generate the configuration
+    labels, sizes, spans = label_clusters(grid)
+    return grid, labels, sizes, spans
+
+class UnionFind:
+    """Disjoint sets over 0..n-1 with union by size and path halving"""
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+        self.size = [1] * n
+
+    def find(self, i: int) -> int:
+        parent = self.parent
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(self, i: int, j: int) -> int:
+        """merge the sets with roots i and j, returning the new root"""
+        if self.size[i] < self.size[j]:
+            i, j = j, i
+        self.parent[j] = i
+        self.size[i] += self.size[j]
+        return i
+
+def newman_ziff(N: int, rng: np.random.Generator = None) -> Tuple[np.typing.NDArray[Any], np.typing.NDArray[Any]]:
+    """Occupy the sites of an NxN lattice one at a time in random order, merging clusters
+       with union-find. Returns, for n = 0..N*N occupied sites, whether a cluster spans
+       top to bottom and the mean size of the finite clusters, those not spanning.
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    M = N * N
+    uf = UnionFind(M)
+    occupied = bytearray(M)
+    top = [False] * M     # per root: cluster touches the first/last row
+    bottom = [False] * M
+    spanning = np.zeros(M+1, dtype=bool)
+    mean_size = np.zeros(M+1)
+    sum_s2 = 0            # sum over clusters of size**2
+    span = set()          # roots of the clusters spanning top to bottom
+    for n, site in enumerate(rng.permutation(M).tolist(), start=1):
+        occupied[site] = 1
+        i, j = divmod(site, N)
+        top[site] = i == 0
+        bottom[site] = i == N-1
+        sum_s2 += 1
+        root = site
+        for nb, ok in ((site-N, i > 0), (site+N, i < N-1), (site-1, j > 0), (site+1, j < N-1)):
+            if ok and occupied[nb]:
+                r = uf.find(nb)
+                if r != root:
+                    s1, s2 = uf.size[root], uf.size[r]
+                    sum_s2 += 2 * s1 * s2
+                    t, b = top[root] or top[r], bottom[root] or bottom[r]
+                    span.discard(root)
+                    span.discard(r)
+                    root = uf.union(root, r)
+                    top[root], bottom[root] = t, b
+        if top[root] and bottom[root]:
+            span.add(root)
+        if span:
+            spanning[n] = True
+            sizes = [uf.size[r] for r in span]
+            s = sum(sizes)
+            mean_size[n] = (sum_s2 - sum(x*x for x in sizes)) / (n - s) if n > s else 0.0
+        else:
+            mean_size[n] = sum_s2 / n
+    return spanning, mean_size
+
+def binomial_average(Q: np.typing.NDArray[Any], ps: np.typing.NDArray[Any]) -> np.typing.NDArray[Any]:
+    """Q(p) = sum_n B(M, n, p) Q_n: from fixed occupation number n to occupation probability p"""
+    from scipy.stats import binom
+    M = len(Q) - 1
+    n = np.arange(M+1)
+    return np.array([binom.pmf(n, M, p) @ Q for p in ps])
+
+def stream_clusters(blocks: Iterable[np.typing.NDArray[Any]],
+                    emit: Optional[Callable] = None
+                    ) -> Tuple[bool, np.typing.NDArray[Any], np.typing.NDArray[Any]]:
+    """Label a lattice arriving as consecutive blocks of rows, keeping only the current
+       block and the labels of the previous block's last row. Clusters still touching
+       the last row stay active, with their size, first/last row and whether they are
+       connected to the top boundary; the others are closed and passed to
+       emit(sizes, rmin, rmax). Returns (spans top to bottom, sizes s, counts n_s).
+    """
+    from scipy import ndimage
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+    prev = None                 # active cluster id (1..K) per column of the last row, 0: empty
+    size = np.zeros(1, dtype=np.int64)   # per active cluster; index 0 unused
+    top = np.zeros(1, dtype=bool)
+    rmin = np.zeros(1, dtype=np.int64)
+    rmax = np.zeros(1, dtype=np.int64)
+    counts = {}
+
+    def close(csize, crmin, crmax):
+        if emit is not None:
+            emit(csize, crmin, crmax)
+        for s, n in zip(*np.unique(csize, return_counts=True)):
+            counts[s] = counts.get(s, 0) + n
+
+    r0 = 0
+    for b in blocks:
+        lab, n = ndimage.label(b)
+        if prev is None:
+            prev = np.zeros(b.shape[1], dtype=np.int64)
+        K = len(size) - 1
+        bsize = np.bincount(lab.ravel(), minlength=n+1)[1:]
+        objs = ndimage.find_objects(lab)
+        brmin = r0 + np.array([o[0].start for o in objs], dtype=np.int64)
+        brmax = r0 + np.array([o[0].stop - 1 for o in objs], dtype=np.int64)
+        btop = np.zeros(n+1, dtype=bool)
+        if r0 == 0:
+            btop[lab[0]] = True
+        btop = btop[1:]
+
+        # merge active clusters from above with the block's clusters touching its first row
+        link = (prev > 0) & (lab[0] > 0)
+        u, v = prev[link] - 1, K + lab[0][link] - 1
+        graph = coo_matrix((np.ones(len(u), dtype=np.int8), (u, v)), shape=(K+n, K+n))
+        nc, comp = connected_components(graph, directed=False)
+        csize = np.bincount(comp, weights=np.concatenate([size[1:], bsize]), minlength=nc).astype(np.int64)
+        ctop = np.bincount(comp, weights=np.concatenate([top[1:], btop]), minlength=nc) > 0
+        crmin = np.full(nc, np.iinfo(np.int64).max)
+        np.minimum.at(crmin, comp, np.concatenate([rmin[1:], brmin]))
+        crmax = np.zeros(nc, dtype=np.int64)
+        np.maximum.at(crmax, comp, np.concatenate([rmax[1:], brmax]))
+
+        last = lab[-1]
+        active = np.zeros(nc, dtype=bool)
+        active[comp[K + last[last > 0] - 1]] = True
+        close(csize[~active], crmin[~active], crmax[~active])
+
+        newid = np.zeros(nc, dtype=np.int64)
+        newid[active] = np.arange(1, np.count_nonzero(active) + 1)
+        prev = np.zeros_like(prev)
+        prev[last > 0] = newid[comp[K + last[last > 0] - 1]]
+        size = np.concatenate([[0], csize[active]])
+        top = np.concatenate([[False], ctop[active]])
+        rmin = np.concatenate([[0], crmin[active]])
+        rmax = np.concatenate([[0], crmax[active]])
+        r0 += len(b)
+
+    # the clusters still active touch the bottom row
+    spans = bool(top[1:].any())
+    close(size[1:], rmin[1:], rmax[1:])
+    s = np.array(sorted(counts), dtype=np.int64)
+    return spans, s, np.array([counts[k] for k in s], dtype=np.int64)
+
+def percolation_stream(N: int = 20, P: float = 0.6, rows: Optional[int] = None, block: Optional[int] = None,
+                       rng: np.random.Generator = None, emit: Optional[Callable] = None):
+    """Percolation on a strip N wide and rows long, generated and labelled block by block
+       in O(N*block) memory. See stream_clusters for the results.
+    """
+    rows = N if rows is None else rows
+    block = max(1, 2**20 // N) if block is None else block
+    rng = np.random.default_rng() if rng is None else rng
+    blocks = (rng.random((min(block, rows - r0), N)) < P for r0 in range(0, rows, block))
+    return stream_clusters(blocks, emit)
+
+def fss_batch(N: int, P: float, trials: int, seed: np.random.SeedSequence,
+              nbins: int) -> Tuple[int, float, float, np.typing.NDArray[Any]]:
+    """trials lattices at (N, P): number spanning, sum and sum of squares of the mean
+       finite cluster size, and cluster counts in bins [2**k, 2**(k+1))
+    """
+    rng = np.random.default_rng(seed)
+    nspan = 0
+    sum_S = sum_S2 = 0.0
+    hist = np.zeros(nbins, dtype=np.int64)
+    for _ in range(trials):
+        grid, labels, sizes, spans = percolation_sim(N, P, rng)
+        spanning = percolates(labels)
+        nspan += len(spanning) > 0
+        hist += np.bincount(np.log2(sizes[1:]).astype(int), minlength=nbins) if len(sizes) > 1 else 0
+        finite = sizes.astype(float)
+        finite[spanning] = 0
+        S = (finite**2).sum() / finite.sum() if finite.sum() > 0 else 0.0
+        sum_S += S
+        sum_S2 += S * S
+    return nspan, sum_S, sum_S2, hist
+
+def fss_sweep(Ns: list, Ps: list, trials: int = 1000, out: str = 'fss.npz', batch: int = 50,
+              workers: Optional[int] = None, seed: Optional[int] = None) -> dict:
+    """Spanning probability, mean cluster size and cluster size distribution for every
+       (N, P), with the trials spread over a process pool in batches. Batch b of (i, j)
+       always gets the seed SeedSequence(entropy, spawn_key=(i, j, b)). Batches finish in
+       any order; each is marked in the mask 'finished' when its totals are merged and
+       saved to out, so an interrupted sweep reruns exactly the unmarked batches and
+       reproduces the same numbers.
+    """
+    Ns, Ps = list(Ns), list(Ps)
+    nbins = int(np.log2(max(Ns)**2)) + 1
+    nbatches = -(-trials // batch)
+    if os.path.exists(out):
+        res = dict(np.load(out))
+        if (list(res['N']) != Ns or not np.allclose(res['P'], Ps) or int(res['batch']) != batch
+                or 'finished' not in res or int(res['trials']) != trials):
+            raise ValueError(f"{out} holds a different sweep")
+    else:
+        entropy = np.random.SeedSequence(seed).entropy
+        shape = (len(Ns), len(Ps))
+        res = {'N': np.array(Ns), 'P': np.array(Ps, dtype=float), 'batch': np.array(batch),
+               'trials': np.array(trials), 'entropy': np.array(str(entropy)), 'edges': 2**np.arange(nbins + 1),
+               'finished': np.zeros(shape + (nbatches,), dtype=bool),
+               'done': np.zeros(shape, dtype=np.int64), 'nspan': np.zeros(shape, dtype=np.int64),
+               'sum_S': np.zeros(shape), 'sum_S2': np.zeros(shape),
+               'hist': np.zeros(shape + (nbins,), dtype=np.int64)}
+    entropy = int(str(res['entropy']))
+
+    def save():
+        tmp = out + '.tmp.npz'
+        np.savez(tmp, **res)
+        os.replace(tmp, out)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        jobs = {}
+        for i, j, b in zip(*np.nonzero(~res['finished'])):
+            n = min(batch, trials - b * batch)
+            ss = np.random.SeedSequence(entropy, spawn_key=(int(i), int(j), int(b)))
+            jobs[pool.submit(fss_batch, Ns[i], Ps[j], n, ss, nbins)] = (i, j, b, n)
+        for job in as_completed(jobs):
+            i, j, b, n = jobs[job]
+            nspan, sum_S, sum_S2, hist = job.result()
+            res['finished'][i, j, b] = True
+            res['done'][i, j] += n
+            res['nspan'][i, j] += nspan
+            res['sum_S'][i, j] += sum_S
+            res['sum_S2'][i, j] += sum_S2
+            res['hist'][i, j, :len(hist)] += hist
+            save()
+    save()
+    return res
+
+def fss_table(res: dict) -> np.typing.NDArray[Any]:
+    """rows of N, P, trials, spanning probability +- error, mean cluster size +- error"""
+    done = np.maximum(res['done'], 1)
+    prob = res['nspan'] / done
+    prob_err = np.sqrt(prob * (1 - prob) / done)
+    S = res['sum_S'] / done
+    S_err = np.sqrt(np.clip(res['sum_S2'] / done - S**2, 0, None) / done)
+    N, P = np.meshgrid(res['N'], res['P'], indexing='ij')
+    return np.column_stack([a.ravel() for a in (N, P, res['done'], prob, prob_err, S, S_err)])
+
+def crossings(res: dict) -> list:
+    """p where the spanning probability curves of consecutive lattice sizes cross"""
+    prob = res['nspan'] / np.maximum(res['done'], 1)
+    Ps = res['P']
+    result = []
+    for i in range(len(res['N']) - 1):
+        d = prob[i+1] - prob[i]
+        k = np.nonzero(np.diff(np.sign(d)))[0]
+        if len(k):
+            k = k[0]
+            result.append((res['N'][i], res['N'][i+1], Ps[k] - d[k] * (Ps[k+1] - Ps[k]) / (d[k+1] - d[k])))
+    return result
+
+def perc01(headless: bool = False, lattices: int = 10):
+    """Visualise percolation on square lattice; headless, only print the counts for some lattices.
+       #clusters includes the isolated occupied sites.
     """
     N=100  # Lattice size (square)
     P=0.5 # Site occupation probability
+    rng = np.random.default_rng()
 
-    fig, ax = plt.subplots()
-    while True:
-        grid, clusters = percolation_sim(N, P)
+    if not headless:
+        import matplotlib.pyplot as plt
+        import matplotlib.colors as mcolors
+        fig, ax = plt.subplots()
+    for _ in (range(lattices) if headless else itertools.count()):
+        grid, labels, sizes, spans = percolation_sim(N, P, rng)
         #single out percolating clusters
-        n_percolating=0
-        for i,c in enumerate(clusters):
-            if percolates(c, N):
-                n_percolating+=1
-            for xy in c:
-                grid[xy]=i+1
-        print(f"#clusters: {len(clusters)}; #percolating: {n_percolating}")
-        #print(grid)
+        n_percolating = len(percolates(labels))
+        print(f"#clusters: {len(sizes)-1}; #percolating: {n_percolating}")
+        #print(labels)
+        if headless:
+            continue
 
         bcolours=['white']
         ecolours=['lightblue', 'pink', 'lightgreen', 'yellow', 'cyan', 'magenta',
                  'black', 'gray', 'orange', 'red', 'blue', 'brown', 'purple', 'darkblue', 
                  'green', 'darkgreen', 'lightgray', 'darkgray', 'gold']
         colours = bcolours + ecolours
-        n_clusters = len(set(grid.flatten())) 
+        n_clusters = len(sizes)
         if n_clusters > len(colours):
             colours += [ecolours[i%len(ecolours)] for i in range(n_clusters-len(ecolours))]
         cmap = mcolors.ListedColormap(colours)
@@ -84,7 +326,7 @@ def perc01():
         norm = mcolors.BoundaryNorm(bounds, cmap.N)
 
         ax.clear()
-        ax.imshow(grid, cmap=cmap, norm=norm)
+        ax.imshow(labels, cmap=cmap, norm=norm)
         ax.set_title('Percolation grid', fontsize=16, color='lightblue')
         ax.set_xticks([])
         ax.set_yticks([])
@@ -99,24 +341,30 @@ def perc01():
      
         ax.clear()
 
-def perc02():
+def perc02(headless: bool = False):
     """ Plot probability of percolation vs site occupation probability for a 2x2 lattice.
-        (fig 8.2)
+        (fig 8.2); headless, print the table
     """
     NRUNS = 1000
     N = 2   
     NDIV = 25
+    rng = np.random.default_rng()
 
     results = []
     for P in np.linspace(0, 1, NDIV): # range of occupation probabilities explored
         nPERC = 0
         for _ in range(NRUNS): # trials with same P
-            grid, clusters = percolation_sim(N, P)
-            for i,c in enumerate(clusters):
-                if percolates(c, N): nPERC+=1
+            grid, labels, sizes, spans = percolation_sim(N, P, rng)
+            if len(percolates(labels)) > 0: nPERC+=1
         prob = nPERC / NRUNS
         results.append((P, prob, np.sqrt(prob * (1 - prob) / NRUNS)))
     ps, probs, errors = zip(*results)
+    if headless:
+        for P, prob, err in results:
+            print(f"{P:.4f} {prob:.4f} {err:.4f}")
+        return
+
+    import matplotlib.pyplot as plt
     plt.errorbar(ps, probs, yerr=errors, fmt='o', label='Numerical calculation')
 
     if N == 2:
@@ -130,20 +378,96 @@ def perc02():
     plt.legend()
     plt.show()
 
+def perc03(N: int = 2, NRUNS: int = 1000, headless: bool = False):
+    """ Percolation probability and mean cluster size vs site occupation probability,
+        Newman-Ziff: one sweep per trial gives the whole curve. Headless, print the table.
+    """
+    NDIV = 101
+    rng = np.random.default_rng()
+    Q = np.zeros(N*N+1)
+    S = np.zeros(N*N+1)
+    for _ in range(NRUNS):
+        spanning, mean_size = newman_ziff(N, rng)
+        Q += spanning
+        S += mean_size
+    Q /= NRUNS
+    S /= NRUNS
+
+    ps = np.linspace(0, 1, NDIV)
+    probs = binomial_average(Q, ps)
+    errors = np.sqrt(np.clip(probs * (1 - probs), 0, None) / NRUNS)
+    sizes = binomial_average(S, ps)
+    if headless:
+        for row in zip(ps, probs, errors, sizes):
+            print(' '.join(f"{v:.4f}" for v in row))
+        return
+
+    import matplotlib.pyplot as plt
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(10, 4))
+    ax1.fill_between(ps, probs - errors, probs + errors, alpha=0.3)
+    ax1.plot(ps, probs, label='Newman-Ziff')
+    if N == 2:
+        ax1.plot(ps, ps ** 2 * (2 - ps ** 2), '--', label='Exact solution')
+    ax1.set_xlabel('Site occupation probability')
+    ax1.set_ylabel(f'P(p, {N})')
+    ax1.set_title('Percolation probability')
+    ax1.legend()
+    ax2.plot(ps, sizes)
+    ax2.set_xlabel('Site occupation probability')
+    ax2.set_ylabel('Mean finite cluster size')
+    ax2.set_title('Mean cluster size')
+    plt.show()
+
+def perc04(N: int = 100, rows: int = 1000000, P: float = 0.5927):
+    """ Percolation on a long strip, streamed row by row in O(N) memory.
+    """
+    spans, s, n_s = percolation_stream(N, P, rows)
+    print(f"{N}x{rows} strip, P={P}: #clusters: {n_s.sum()}; largest: {s[-1] if len(s) else 0}; "
+          f"mean size: {(s * n_s).sum() / max(n_s.sum(), 1):.2f}; percolating: {spans}")
+
+def perc05(Ns: list, Ps: list, trials: int, out: str, workers: Optional[int], seed: Optional[int]):
+    """ Finite-size scaling sweep on a process pool; results in out (.npz) and out.csv
+    """
+    res = fss_sweep(Ns, Ps, trials, out, workers=workers, seed=seed)
+    table = fss_table(res)
+    np.savetxt(os.path.splitext(out)[0] + '.csv', table, delimiter=',', fmt='%.6g',
+               header='N,P,trials,prob,prob_err,S,S_err')
+    for N1, N2, pc in crossings(res):
+        print(f"P({N1}) and P({N2}) cross at p = {pc:.4f}")
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="A simulation of a percolating system.")
     parser.add_argument(
         "-ex",
         type=int,
-        choices=[1, 2],
+        choices=[1, 2, 3, 4, 5],
         default = 1,
         required=False,
-        help="Example number (1: visualise percolation on a square lattice, 2: Percolation probability)",
+        help="Example number (1: visualise percolation on a square lattice, 2: Percolation probability, "
+             "3: Percolation probability and cluster size, Newman-Ziff, 4: streamed strip lattice, "
+             "5: finite-size scaling sweep)",
     )
+    parser.add_argument("-N", type=int, default=None,
+                        help="Lattice size (width) for examples 3 and 4 (default: 2 and 100)")
+    parser.add_argument("-rows", type=int, default=1000000, help="Strip length for example 4")
+    parser.add_argument("-P", type=float, default=0.5927, help="Site occupation probability for example 4")
+    parser.add_argument("-trials", type=int, default=1000, help="Number of trials for examples 3 and 5")
+    parser.add_argument("-sizes", type=int, nargs='+', default=[16, 32, 64], help="Lattice sizes for example 5")
+    parser.add_argument("-ps", type=float, nargs=3, default=[0.55, 0.65, 21], metavar=('PMIN', 'PMAX', 'NP'),
+                        help="Occupation probabilities for example 5")
+    parser.add_argument("-out", default="fss.npz", help="Results file for example 5, resumed if it exists")
+    parser.add_argument("-workers", type=int, default=None, help="Worker processes for example 5")
+    parser.add_argument("-seed", type=int, default=None, help="Root seed for example 5")
+    parser.add_argument("-headless", action="store_true", help="Print results instead of plotting (examples 1-3)")
     args = parser.parse_args()
     EX = args.ex
+    size = {} if args.N is None else {'N': args.N}  # else each example's own default
 
     match EX:
-        case 1: perc01()
-        case 2: perc02()
+        case 1: perc01(args.headless)
+        case 2: perc02(args.headless)
+        case 3: perc03(**size, NRUNS=args.trials, headless=args.headless)
+        case 4: perc04(**size, rows=args.rows, P=args.P)
+        case 5: perc05(args.sizes, np.linspace(args.ps[0], args.ps[1], int(args.ps[2])), args.trials,
+                       args.out, args.workers, args.seed)
         case _: print("No such.");
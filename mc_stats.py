@@ -0,0 +1,21 @@
+# Statistics of Markov chain time series shared by the chapters: the integrated
+# autocorrelation time that turns a chain's length into a number of independent samples.
+
+import numpy as np
+
+def autocorrelation_time(x, c=5.0):
+    """Integrated autocorrelation time 1/2 + sum_t rho(t), summed up to the
+       smallest window W with W >= c*tau (Sokal's automatic windowing).
+    """
+    x = np.asarray(x, dtype=float)
+    n = len(x)
+    dx = x - x.mean()
+    var = dx @ dx
+    if n < 2 or var == 0:
+        return 0.5
+    f = np.fft.rfft(dx, 2*n)
+    rho = np.fft.irfft(f * np.conj(f))[:n] / var
+    taus = np.cumsum(rho) - 0.5
+    W = np.arange(n)
+    ok = W >= c * taus
+    return taus[np.argmax(ok)] if ok.any() else taus[-1]
@@ -0,0 +1,230 @@
+# Reproducible batch runs of the simulations. A manifest lists jobs (simulation name
+# and parameters) under one root seed; job k draws all its random numbers from child k of
+# SeedSequence(seed).spawn, so every job is independent of the others and of how many
+# worker processes run them. Each result is stored as npz under a key derived from the
+# simulation, its parameters and its seed, with a run manifest of array digests.
+
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+from itertools import product
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+# name -> function(rng, **params) returning a dict of arrays
+SIMULATIONS = {}
+
+def simulation(name):
+    def register(run):
+        SIMULATIONS[name] = run
+        return run
+    return register
+
+@simulation('ising')
+def ising(rng, NX=32, NY=32, tau=2.0, update='metropolis', nequil=1000, nsteps=10000):
+    """|m| and u per site after every step, and the table row of observables"""
+    from ch20_ising_model import IsingModel, TABLE, advance, observables
+    model = IsingModel(NX=NX, NY=NY, tau=tau, seed=rng, update=update)
+    advance(model, nequil)
+    _, mags, energies = advance(model, nsteps)
+    row = observables(tau, mags, energies, NX * NY)
+    return dict(m_series=mags, e_series=energies, **{name: row[name] for name in TABLE.names})
+
+@simulation('percolation')
+def percolation(rng, N=64, P=0.5927, trials=100):
+    """Per trial: whether a cluster spans top to bottom, the largest cluster and the
+       number of clusters
+    """
+    from ch8_perc import percolation_sim, percolates
+    spanning = np.zeros(trials, dtype=bool)
+    largest = np.zeros(trials, dtype=np.int64)
+    nclusters = np.zeros(trials, dtype=np.int64)
+    for k in range(trials):
+        grid, labels, sizes, spans = percolation_sim(N, P, rng)
+        spanning[k] = len(percolates(labels)) > 0
+        largest[k] = sizes[1:].max(initial=0)
+        nclusters[k] = len(sizes) - 1
+    return dict(spanning=spanning, largest=largest, nclusters=nclusters)
+
+@simulation('hydrogen')
+def hydrogen(rng, n=2, l=1, m=0, npoints=100000, walkers=1000, burn=100, target=None):
+    """Ensemble Markov chain samples of |psi_nlm|^2"""
+    from ch7_hydrogen import HydrogenAtomMarkovChain
+    chain = HydrogenAtomMarkovChain(n, l, m, seed=rng)
+    points = chain.sample_ensemble(npoints, walkers, burn, target)
+    return dict(points=points, acceptance=chain.acceptance, sigma=chain.sigma)
+
+@simulation('integral')
+def integral(rng, example='exponential', N=100000, method='plain', replicas=16):
+    """Monte Carlo estimate of one of the ch7_basic_mc_integrate examples"""
+    from ch7_basic_mc_integrate import examples, calculate_integral
+    known = {name: (dist, f, proposal) for name, dist, f, proposal in examples()}
+    if example not in known:
+        raise ValueError(f"unknown example {example!r}, expected one of {list(known)}")
+    dist, f, proposal = known[example]
+    fBar, sigma = calculate_integral(dist, N, f, method, proposal, replicas=replicas, rng=rng)
+    return dict(fBar=fBar, sigma=sigma)
+
+def job_key(job, seed):
+    """File stem of a job's result: simulation name and a hash of parameters and seed"""
+    text = json.dumps([job['sim'], job['params'], str(seed.entropy), list(seed.spawn_key)], sort_keys=True)
+    return f"{job['sim']}-{hashlib.sha256(text.encode()).hexdigest()[:16]}"
+
+def digest(arrays):
+    """sha256 over names, dtypes, shapes and bytes of the arrays, in name order"""
+    h = hashlib.sha256()
+    for name in sorted(arrays):
+        a = np.ascontiguousarray(arrays[name])
+        h.update(f"{name}:{a.dtype.str}:{a.shape}".encode())
+        h.update(a.tobytes())
+    return h.hexdigest()
+
+def run_job(sim, params, seed, path=None):
+    """Run one job (process pool worker); with a path the result is saved atomically"""
+    t0 = time.perf_counter()
+    output = SIMULATIONS[sim](np.random.default_rng(seed), **params)
+    result = {name: np.asarray(value) for name, value in output.items()}
+    seconds = time.perf_counter() - t0
+    if path is not None:
+        tmp = path + '.tmp.npz'
+        np.savez(tmp, **result)
+        os.replace(tmp, path)
+    return digest(result), seconds
+
+def load_manifest(path):
+    """Read a manifest, giving it fresh root entropy (written back) if it has none, so a
+       rerun of the same file reproduces the same streams
+    """
+    with open(path) as f:
+        manifest = json.load(f)
+    if manifest.get('seed') is None:
+        manifest['seed'] = np.random.SeedSequence().entropy
+        with open(path, 'w') as f:
+            json.dump(manifest, f, indent=1)
+    for job in manifest['jobs']:
+        if job['sim'] not in SIMULATIONS:
+            raise ValueError(f"unknown simulation {job['sim']!r}, expected one of {list(SIMULATIONS)}")
+        job.setdefault('params', {})
+    return manifest
+
+def run_manifest(path, out, workers=None, force=False, check=False):
+    """Run every job of the manifest at path whose result is not yet in out, in a process
+       pool, and write out/manifest.json recording each job's key, seed and digest.
+       With check, every job is recomputed in memory and compared against the digests
+       already recorded; returns the list of mismatching keys.
+    """
+    manifest = load_manifest(path)
+    jobs = manifest['jobs']
+    seeds = np.random.SeedSequence(manifest['seed']).spawn(len(jobs))
+    os.makedirs(out, exist_ok=True)
+    record_path = os.path.join(out, 'manifest.json')
+    records = {}
+    if os.path.exists(record_path):
+        with open(record_path) as f:
+            records = {r['key']: r for r in json.load(f)['jobs']}
+
+    keys = [job_key(job, seed) for job, seed in zip(jobs, seeds)]
+    todo = [k for k, key in enumerate(keys)
+            if check or force or key not in records or not os.path.exists(os.path.join(out, key + '.npz'))]
+    print(f"{len(jobs)} jobs, {len(jobs) - len(todo)} already done, running {len(todo)}")
+    paths = [None if check else os.path.join(out, keys[k] + '.npz') for k in todo]
+    args = ([jobs[k]['sim'] for k in todo], [jobs[k]['params'] for k in todo], [seeds[k] for k in todo], paths)
+    if workers == 1:
+        results = map(run_job, *args)
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        results = pool.map(run_job, *args)
+
+    mismatches = []
+    try:
+        for k, (sha, seconds) in zip(todo, results):
+            key = keys[k]
+            if check:
+                status = 'ok' if records.get(key, {}).get('sha256') == sha else 'MISMATCH'
+                if status != 'ok':
+                    mismatches.append(key)
+                print(f"{key} {status}")
+                continue
+            records[key] = {
+                'key': key, 'file': key + '.npz', 'sim': jobs[k]['sim'], 'params': jobs[k]['params'],
+                'entropy': str(seeds[k].entropy), 'spawn_key': list(seeds[k].spawn_key),
+                'sha256': sha, 'seconds': seconds,
+            }
+            print(f"{key} {seconds:8.2f} s")
+            # rewritten after every job so an interrupted run can resume
+            tmp = record_path + '.tmp'
+            with open(tmp, 'w') as f:
+                done = [records[key] for key in keys if key in records]
+                json.dump({'seed': str(manifest['seed']), 'jobs': done}, f, indent=1)
+            os.replace(tmp, record_path)
+    finally:
+        if workers != 1:
+            pool.shutdown()
+    return mismatches
+
+def parse_value(text):
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return text
+
+def make_manifest(path, sim, grid, fixed, replicas=1, seed=None):
+    """Append the jobs of a parameter grid to the manifest at path (created if missing).
+       grid maps parameter names to lists of values, fixed to single values; each grid
+       point is repeated replicas times; the repeats differ only by their seeds.
+    """
+    if sim not in SIMULATIONS:
+        raise ValueError(f"unknown simulation {sim!r}, expected one of {list(SIMULATIONS)}")
+    manifest = {'seed': seed, 'jobs': []}
+    if os.path.exists(path):
+        with open(path) as f:
+            manifest = json.load(f)
+    for values in product(*grid.values()):
+        params = dict(fixed, **dict(zip(grid, values)))
+        manifest['jobs'] += [{'sim': sim, 'params': params} for _ in range(replicas)]
+    with open(path, 'w') as f:
+        json.dump(manifest, f, indent=1)
+    return manifest
+
+def main():
+    parser = argparse.ArgumentParser(description="Reproducible batch runs of the simulations.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('list', help='List the registered simulations')
+    make = sub.add_parser('make', help='Append a parameter grid to a manifest')
+    make.add_argument('manifest')
+    make.add_argument('sim', choices=sorted(SIMULATIONS))
+    make.add_argument('--grid', nargs='+', default=[], metavar='NAME=V1,V2', help='Parameters to scan')
+    make.add_argument('--set', nargs='+', default=[], metavar='NAME=V', help='Fixed parameters')
+    make.add_argument('--replicas', type=int, default=1, help='Independent repeats of each grid point')
+    make.add_argument('--seed', type=int, default=None,
+                      help='Root seed of a new manifest (default: fresh entropy)')
+    run = sub.add_parser('run', help='Run the jobs of a manifest')
+    run.add_argument('manifest')
+    run.add_argument('--out', default='runs', help='Directory for the npz results and run manifest')
+    run.add_argument('--workers', type=int, default=None, help='Worker processes (1: run in this process)')
+    run.add_argument('--force', action='store_true', help='Rerun jobs that are already done')
+    run.add_argument('--check', action='store_true',
+                     help='Recompute every job and compare with the recorded digests')
+    args = parser.parse_args()
+
+    match args.command:
+        case 'list':
+            for name, sim in SIMULATIONS.items():
+                print(f"{name:>12}  {sim.__doc__.splitlines()[0]}")
+        case 'make':
+            grid = {n: [parse_value(v) for v in vs.split(',')] for n, vs in (g.split('=', 1) for g in args.grid)}
+            fixed = {n: parse_value(v) for n, v in (s.split('=', 1) for s in args.set)}
+            manifest = make_manifest(args.manifest, args.sim, grid, fixed, args.replicas, args.seed)
+            print(f"{args.manifest}: {len(manifest['jobs'])} jobs")
+        case 'run':
+            mismatches = run_manifest(args.manifest, args.out, args.workers, args.force, args.check)
+            if args.check:
+                print(f"{len(mismatches)} mismatch(es)")
+                return 1 if mismatches else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())